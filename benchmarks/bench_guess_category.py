@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Compares the compiled RuleMatcher against the old list-of-lambdas loop.
+#   python benchmarks/bench_guess_category.py --rules 5000 --names 20000
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rule_matcher import RuleMatcher
+
+
+def random_word(rng: random.Random, lo = 4, hi = 10) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(lo, hi)))
+
+def make_rules(rng: random.Random, n: int) -> dict:
+    return {"contains_rules": [{"target": random_word(rng), "category": f"cat{i % 25}"} for i in range(n)]}
+
+def make_names(rng: random.Random, rules: dict, n: int, hit_rate = 0.5) -> list[str]:
+    targets = [rule["target"] for rule in rules["contains_rules"]]
+    names = []
+    for _ in range(n):
+        words = [random_word(rng) for _ in range(rng.randint(2, 5))]
+        if rng.random() < hit_rate:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(targets))
+        names.append(" ".join(words).upper())
+    return names
+
+def linear_rules(rules: dict):
+    # Same shape as the original guess_categorize.RULES loop
+    out = []
+    for rule in rules["contains_rules"]:
+        target = rule["target"].lower()
+        category = rule["category"].lower()
+        out.append(lambda name, target=target, category=category: category if target in name.lower() else None)
+    return out
+
+def guess_linear(rule_fns, name: str) -> str | None:
+    name = name.lower()
+    for rule_fn in rule_fns:
+        category = rule_fn(name)
+        if category:
+            return category
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark guess_category rule evaluation")
+    parser.add_argument("--rules", type=int, default=1000)
+    parser.add_argument("--names", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = make_rules(rng, args.rules)
+    names = make_names(rng, rules, args.names)
+
+    t0 = time.perf_counter()
+    rule_fns = linear_rules(rules)
+    t1 = time.perf_counter()
+    matcher = RuleMatcher(rules)
+    t2 = time.perf_counter()
+
+    linear = [guess_linear(rule_fns, name) for name in names]
+    t3 = time.perf_counter()
+    compiled = [matcher.match(name) for name in names]
+    t4 = time.perf_counter()
+
+    assert linear == compiled, "compiled matcher disagrees with the linear loop"
+    print(f"rules={args.rules} names={args.names}")
+    print(f"build   linear {t1 - t0:8.4f}s  compiled {t2 - t1:8.4f}s")
+    print(f"match   linear {t3 - t2:8.4f}s  compiled {t4 - t3:8.4f}s  speedup {(t3 - t2) / max(t4 - t3, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
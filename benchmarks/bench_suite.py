@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# Times each subcommand's core function against synthetic ledgers and writes JSON results.
+#   python benchmarks/bench_suite.py --sizes 10000 100000 1000000 --rules 500 --out bench_results.json
+#   python benchmarks/bench_suite.py --sizes 10000 --compare old_results.json
+# Every phase runs in a fresh interpreter so peak RSS belongs to that phase alone.
+import argparse
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+PHASES = ["update", "get", "summary", "guess"]
+
+
+def peak_rss_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def timed(fn, repeat: int = 1):
+    # Best of `repeat` runs; returns (last result, seconds)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def use_workdir(workdir: Path, rows: int):
+    # Point utils at a scratch ledger instead of db/
+    import utils
+
+    utils.DB_PATH = workdir / f"ledger-{rows}.sqlite3"
+    utils.LEGACY_DB_PATH = workdir / "missing.json"
+    utils.LAST_SYNCS_PATH = workdir / "missing_last_syncs.json"
+    utils.SNAPSHOT_PATH = workdir / f"ledger-{rows}.snap"
+    return utils
+
+def ledger_range(days: int) -> tuple[date, date]:
+    from synthetic import START
+    return START.date(), START.date() + timedelta(days=days)
+
+
+def phase_update(args, utils) -> dict:
+    from synthetic import generate_ledger
+
+    seconds = {"generate": 0.0, "update_db_from_list": 0.0}
+    inserted = 0
+    batches = generate_ledger(args.rows, args.seed, args.days, args.batch_size)
+    while True:
+        batch, elapsed = timed(lambda: next(batches, None))
+        seconds["generate"] += elapsed
+        if batch is None:
+            break
+        (count, _), elapsed = timed(lambda: utils.update_db_from_list(batch))
+        seconds["update_db_from_list"] += elapsed
+        inserted += count
+    # Re-sending the same rows exercises the already-known path
+    first = next(generate_ledger(min(args.rows, args.batch_size), args.seed, args.days, args.batch_size))
+    (_, skipped), seconds["update_db_from_list_known"] = timed(lambda: utils.update_db_from_list(first))
+    return {"seconds": seconds, "inserted": inserted, "skipped": skipped, "rows_per_second": inserted / seconds["update_db_from_list"]}
+
+def phase_get(args, utils) -> dict:
+    from mytypes import CardType
+
+    start, end = ledger_range(args.days)
+    month = end - timedelta(days=30)
+    seconds, counts = {}, {}
+    for card in CardType:
+        for label, lo, only_uncategorized in (("all", start, False), ("month", month, False), ("uncategorized", start, True)):
+            key = f"{card.name.lower()}_{label}"
+            found, seconds[key] = timed(lambda: utils.query_transactions(utils.query_between_dates(lo, end, [card]).only_uncategorized(only_uncategorized)), args.repeat)
+            counts[key] = len(found)
+    return {"seconds": seconds, "rows_returned": counts}
+
+def phase_summary(args, utils) -> dict:
+    from mytypes import CardType
+
+    start, end = ledger_range(args.days)
+    cards = list(CardType)
+    seconds = {}
+    (_, count), seconds["rollups"] = timed(lambda: utils.get_summary_between_dates(start, end, cards), args.repeat)
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        _, seconds["columnar"] = timed(lambda: utils.get_frame_between_dates(start, end, cards).sum_by("my_category"), args.repeat)
+    return {"seconds": seconds, "rows_summarized": count}
+
+def phase_guess(args, utils) -> dict:
+    import guess_categorize
+    from synthetic import generate_rules
+
+    rules_path = args.workdir / f"my_rules-{args.rules}.json"
+    with open(rules_path, "w") as f:
+        json.dump(generate_rules(args.rules, args.seed), f)
+    guess_categorize.RULES_PATH = rules_path
+    guess_categorize.get_rules.cache_clear()
+    guess_categorize.get_matcher.cache_clear()
+
+    db = utils.open_store()
+    pairs = db.conn.execute("SELECT name, merchant_name FROM transactions LIMIT ?", (args.guess_rows,)).fetchall()
+    db.close()
+
+    seconds = {}
+    _, seconds["compile"] = timed(guess_categorize.get_matcher)
+    guesses, seconds["guess_category"] = timed(lambda: [guess_categorize.guess_category(name, merchant) for name, merchant in pairs], args.repeat)
+    matched = sum(guess is not None for guess in guesses)
+    return {"seconds": seconds, "rules": args.rules, "names": len(pairs), "matched": matched, "names_per_second": len(pairs) / max(seconds["guess_category"], 1e-9)}
+
+PHASE_FNS = {"update": phase_update, "get": phase_get, "summary": phase_summary, "guess": phase_guess}
+
+
+def run_phase(args):
+    utils = use_workdir(args.workdir, args.rows)
+    result = PHASE_FNS[args.phase](args, utils)
+    result.update(phase=args.phase, rows=args.rows, peak_rss_kb=peak_rss_kb())
+    print(json.dumps(result))
+
+def spawn_phase(args, phase: str, rows: int) -> dict:
+    cmd = [
+        sys.executable, __file__, "--phase", phase, "--rows", str(rows), "--workdir", str(args.workdir),
+        "--seed", str(args.seed), "--days", str(args.days), "--rules", str(args.rules),
+        "--guess-rows", str(args.guess_rows), "--repeat", str(args.repeat), "--batch-size", str(args.batch_size),
+    ]
+    result = subprocess.run(cmd, cwd=REPO, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"{phase} at {rows} rows failed:\n{result.stderr}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def git_commit() -> str | None:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+def print_result(result: dict, baseline: dict | None):
+    print(f"  {result['phase']:<8} rss {result['peak_rss_kb'] / 1024:7.1f} MiB")
+    old = (baseline or {}).get("seconds", {})
+    for name, seconds in result["seconds"].items():
+        line = f"    {name:<28} {seconds:9.4f}s"
+        if old.get(name):
+            line += f"  x{seconds / old[name]:.2f} vs baseline"
+        print(line)
+
+def find_baseline(previous: dict | None, phase: str, rows: int) -> dict | None:
+    for result in (previous or {}).get("results", []):
+        if result["phase"] == phase and result["rows"] == rows:
+            return result
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tracker's core functions on synthetic ledgers")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Ledger sizes in rows (up to 10M)")
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=PHASES)
+    parser.add_argument("--rules", type=int, default=500, help="Rules in the generated my_rules.json")
+    parser.add_argument("--guess-rows", type=int, default=100_000, help="Names fed to guess_category")
+    parser.add_argument("--days", type=int, default=3 * 365, help="Days the ledger spans")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N for read phases")
+    parser.add_argument("--batch-size", type=int, default=100_000, help="Rows per update_db_from_list call")
+    parser.add_argument("--workdir", type=Path, help="Keep generated ledgers here instead of a temp dir")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="Previous results JSON to print ratios against")
+    # Internal: run a single phase in this process
+    parser.add_argument("--phase", choices=PHASES, help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        run_phase(args)
+        return
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    scratch = args.workdir is None
+    args.workdir = Path(tempfile.mkdtemp(prefix="tracker-bench-")) if scratch else args.workdir
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    results = []
+    try:
+        for rows in args.sizes:
+            print(f"{rows} rows")
+            if "update" in args.phases:
+                for stale in args.workdir.glob(f"ledger-{rows}.*"):
+                    stale.unlink()
+            for phase in args.phases:
+                result = spawn_phase(args, phase, rows)
+                print_result(result, find_baseline(previous, phase, rows))
+                results.append(result)
+    finally:
+        if scratch:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("phase", "rows", "workdir", "compare", "out")},
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Cold-start regression check for the read-only commands.
+#   python benchmarks/check_startup.py --budget-ms 80
+# Imports tracker under -X importtime in a fresh interpreter, fails if any
+# sync-only dependency is pulled in or the cumulative import time is over budget.
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+
+# Only `update`, `categorize --auto`, `--columnar` and get_access_token.py may load these
+FORBIDDEN = ["plaid", "dotenv", "flask", "numpy", "concurrent.futures", "rule_matcher", "sync", "frame", "daemon", "socketserver"]
+
+
+def import_times(module: str) -> dict[str, int]:
+    # module -> cumulative import time in microseconds
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check tracker cold-start import cost")
+    parser.add_argument("--budget-ms", type=float, default=80.0)
+    parser.add_argument("--runs", type=int, default=5, help="Take the best of N runs")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.runs):
+        times = import_times("tracker")
+        if best is None or times["tracker"] < best["tracker"]:
+            best = times
+
+    loaded = [name for name in best if any(name == f or name.startswith(f + ".") for f in FORBIDDEN)]
+    total_ms = best["tracker"] / 1000
+    print(f"import tracker: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, us in sorted(best.items(), key=lambda kv: kv[1], reverse=True)[:10]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: sync-only modules imported at startup: {', '.join(sorted(loaded))}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# Deterministic synthetic ledgers and rule files for benchmarking.
+#   python benchmarks/synthetic.py --rows 100000 --db /tmp/ledger.sqlite3 --rules 500 --rules-out /tmp/my_rules.json
+# The same seed always yields the same transactions, so results are comparable across commits.
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mytypes import MyTransaction, CardType
+
+
+START = datetime(2022, 1, 1)
+DAYS = 3 * 365
+# Rough share of transactions per card
+CARD_WEIGHTS = {CardType.CHASEPRIME: 0.5, CardType.BILT: 0.3, CardType.VENMO: 0.2}
+MERCHANTS = [
+    ("Uber", "TRANSPORTATION", "TRANSPORTATION_TAXIS_AND_RIDE_SHARES", 8, 60),
+    ("Lyft", "TRANSPORTATION", "TRANSPORTATION_TAXIS_AND_RIDE_SHARES", 8, 60),
+    ("Shell", "TRANSPORTATION", "TRANSPORTATION_GAS", 20, 90),
+    ("Starbucks", "FOOD_AND_DRINK", "FOOD_AND_DRINK_COFFEE", 3, 15),
+    ("Chipotle", "FOOD_AND_DRINK", "FOOD_AND_DRINK_FAST_FOOD", 9, 30),
+    ("Whole Foods", "FOOD_AND_DRINK", "FOOD_AND_DRINK_GROCERIES", 15, 250),
+    ("Trader Joe's", "FOOD_AND_DRINK", "FOOD_AND_DRINK_GROCERIES", 15, 150),
+    ("Amazon", "GENERAL_MERCHANDISE", "GENERAL_MERCHANDISE_ONLINE_MARKETPLACES", 5, 400),
+    ("Target", "GENERAL_MERCHANDISE", "GENERAL_MERCHANDISE_SUPERSTORES", 10, 200),
+    ("Netflix", "ENTERTAINMENT", "ENTERTAINMENT_TV_AND_MOVIES", 15, 23),
+    ("Spotify", "ENTERTAINMENT", "ENTERTAINMENT_MUSIC_AND_AUDIO", 10, 17),
+    ("Delta", "TRAVEL", "TRAVEL_FLIGHTS", 90, 900),
+    ("Airbnb", "TRAVEL", "TRAVEL_LODGING", 100, 1500),
+    ("Bilt Rent", "RENT_AND_UTILITIES", "RENT_AND_UTILITIES_RENT", 1500, 3500),
+    (None, "TRANSFER_OUT", "TRANSFER_OUT_ACCOUNT_TRANSFER", 5, 300),
+]
+MY_CATEGORIES = ["transport", "food", "groceries", "shopping", "subscriptions", "travel", "rent", "friends"]
+
+
+def make_transaction(rng: random.Random, i: int, days: int = DAYS, categorized_rate: float = 0.7) -> MyTransaction:
+    card = rng.choices(list(CARD_WEIGHTS), weights=list(CARD_WEIGHTS.values()))[0]
+    merchant, category, subcategory, lo, hi = rng.choice(MERCHANTS)
+    if card == CardType.VENMO:
+        merchant, category, subcategory = None, "TRANSFER_OUT", "TRANSFER_OUT_ACCOUNT_TRANSFER"
+        name = f"Venmo payment to {rng.choice(['Alex', 'Sam', 'Jordan', 'Priya', 'Wei', 'Maria'])}"
+    else:
+        name = f"{(merchant or 'TRANSFER').upper()} #{rng.randrange(10_000):04d} {rng.choice(['NEW YORK NY', 'SEATTLE WA', 'ONLINE', 'SAN FRANCISCO CA'])}"
+    moment = START + timedelta(seconds=rng.random() * days * 86400)
+    is_categorized = rng.random() < categorized_rate
+    return MyTransaction(
+        datetime=moment.timestamp(),
+        amount=round(rng.uniform(lo, hi), 2),
+        name=name,
+        merchant_name=merchant,
+        plaid_category=category,
+        plaid_subcategory=subcategory,
+        account=card.name,
+        transaction_id=f"synthetic-{i:010d}",
+        is_categorized=is_categorized,
+        my_category=rng.choice(MY_CATEGORIES) if is_categorized else None,
+    )
+
+def generate_ledger(rows: int, seed: int = 0, days: int = DAYS, batch_size: int = 100_000):
+    # Yields lists of at most batch_size transactions, so 10M-row ledgers never sit in memory at once
+    rng = random.Random(seed)
+    for start in range(0, rows, batch_size):
+        yield [make_transaction(rng, i, days) for i in range(start, min(start + batch_size, rows))]
+
+
+def random_word(rng: random.Random, lo = 4, hi = 10) -> str:
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(lo, hi)))
+
+def generate_rules(n: int, seed: int = 0) -> dict:
+    # Same shape as db/my_rules.json. Real merchants come first so a share of
+    # the ledger matches; the rest are filler that has to be scanned past.
+    rng = random.Random(seed)
+    contains, equal, regex = [], [], []
+    for merchant, *_ in MERCHANTS:
+        if merchant and len(contains) < n:
+            contains.append({"target": merchant.lower(), "category": rng.choice(MY_CATEGORIES)})
+    while len(contains) + len(equal) + len(regex) < n:
+        kind = rng.random()
+        if kind < 0.8:
+            contains.append({"target": random_word(rng), "category": rng.choice(MY_CATEGORIES)})
+        elif kind < 0.95:
+            equal.append({"target": f"{random_word(rng)} {random_word(rng)}", "category": rng.choice(MY_CATEGORIES)})
+        else:
+            regex.append({"pattern": rf"{random_word(rng, 3, 5)}\s*#?\d+", "category": rng.choice(MY_CATEGORIES)})
+    return {"contains_rules": contains, "equal_rules": equal, "regex_rules": regex}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic ledger and rules file")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=DAYS)
+    parser.add_argument("--db", help="SQLite ledger to fill")
+    parser.add_argument("--rules", type=int, default=200)
+    parser.add_argument("--rules-out", help="Where to write the my_rules.json")
+    args = parser.parse_args()
+
+    if args.db:
+        from store import TransactionStore
+
+        db = TransactionStore(args.db)
+        total = 0
+        for batch in generate_ledger(args.rows, args.seed, args.days):
+            total += db.upsert_many(batch)[0]
+        db.build_rollups()
+        db.close()
+        print(f"Wrote {total} transactions to {args.db}")
+    if args.rules_out:
+        with open(args.rules_out, "w") as f:
+            json.dump(generate_rules(args.rules, args.seed), f, indent=2)
+        print(f"Wrote {args.rules} rules to {args.rules_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import re
+
+
+_NOISE = re.compile(r"[^a-z]+")
+
+
+def normalize_merchant(name: str | None, merchant_name: str | None) -> str | None:
+    # "UBER *TRIP 8005928996" and "Uber Trip" both become "uber trip"
+    raw = merchant_name or name
+    if not raw:
+        return None
+    key = _NOISE.sub(" ", raw.lower()).strip()
+    return key or None
+
+
+class CategoryHistory:
+    # normalized merchant -> {category: times the user picked it}
+    def __init__(self, counts: dict[str, dict[str, int]] | None = None):
+        self.counts = counts if counts is not None else {}
+
+    def record(self, key: str | None, old_category: str | None, new_category: str | None):
+        if key is None:
+            return
+        seen = self.counts.setdefault(key, {})
+        if old_category is not None and seen.get(old_category, 0) > 0:
+            seen[old_category] -= 1
+            if seen[old_category] == 0:
+                del seen[old_category]
+        if new_category is not None:
+            seen[new_category] = seen.get(new_category, 0) + 1
+
+    def lookup(self, name: str | None, merchant_name: str | None) -> tuple[str, int, int] | None:
+        # (best category, its count, total answers for this merchant)
+        seen = self.counts.get(normalize_merchant(name, merchant_name))
+        if not seen:
+            return None
+        category, count = max(seen.items(), key=lambda kv: kv[1])
+        return category, count, sum(seen.values())
@@ -0,0 +1,157 @@
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+from utils import SOCKET_PATH
+
+# Output is streamed back as it is printed, in frames of (stream, length) + payload,
+# so the client can keep stdout and stderr apart. The last frame is (EXIT, status).
+FRAME = struct.Struct("!BI")
+STDOUT, STDERR, EXIT = 1, 2, 0
+
+
+class SocketWriter(io.TextIOBase):
+    def __init__(self, sock: socket.socket, stream: int):
+        self.sock = sock
+        self.stream = stream
+
+    def writable(self):
+        return True
+
+    def write(self, text: str) -> int:
+        data = text.encode()
+        if data:
+            self.sock.sendall(FRAME.pack(self.stream, len(data)) + data)
+        return len(text)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        out = SocketWriter(self.request, STDOUT)
+        err = SocketWriter(self.request, STDERR)
+        try:
+            argv = json.loads(self.rfile.readline())["argv"]
+        except (ValueError, KeyError, TypeError):
+            argv = None
+        if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+            err.write("Error: expected {\"argv\": [...]}\n")
+            self.request.sendall(FRAME.pack(EXIT, 2))
+            return
+        status = 0
+        # Commands print through the process-wide stdout, so they run one at a time
+        with self.server.lock, redirect_stdout(out), redirect_stderr(err):
+            try:
+                self.server.run_command(argv)
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except BrokenPipeError:
+                return
+            except Exception as e:
+                print(f"Error: {e}", file=err)
+                status = 1
+        self.request.sendall(FRAME.pack(EXIT, status))
+
+
+class TrackerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, run_command):
+        self.lock = threading.Lock()
+        self.run_command = run_command
+        super().__init__(str(path), RequestHandler)
+
+
+def is_running(path = SOCKET_PATH) -> bool:
+    if not path.exists():
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(path))
+        return True
+    except OSError:
+        return False
+
+
+def recv_exactly(sock: socket.socket, n: int) -> bytes | None:
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+def forward(argv: list[str], stdout, stderr = None, path = SOCKET_PATH) -> int | None:
+    # Returns the command's exit status, or None if no daemon answered
+    stderr = stderr or sys.stderr
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(str(path))
+    except OSError:
+        return None
+
+    streams = {STDOUT: stdout, STDERR: stderr}
+    with sock:
+        sock.sendall(json.dumps({"argv": argv}).encode() + b"\n")
+        while True:
+            header = recv_exactly(sock, FRAME.size)
+            if header is None:
+                # The daemon went away mid-command
+                return 1
+            stream, length = FRAME.unpack(header)
+            if stream == EXIT:
+                return length
+            payload = recv_exactly(sock, length)
+            if payload is None:
+                return 1
+            streams[stream].write(payload.decode(errors="replace"))
+
+
+def schedule_updates(server: TrackerServer, every_minutes: float, run_update):
+    def loop():
+        while True:
+            time.sleep(every_minutes * 60)
+            with server.lock:
+                try:
+                    run_update()
+                except Exception as e:
+                    print(f"Scheduled update failed: {e}", flush=True)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+
+def server_exit():
+    raise SystemExit(0)
+
+
+def serve(run_command, warm_up, update_every: float | None = None, run_update = None, path = SOCKET_PATH):
+    if is_running(path):
+        raise SystemExit(f"A tracker daemon is already listening on {path}")
+    if path.exists():
+        os.unlink(path)
+
+    warm_up()
+    server = TrackerServer(path, run_command)
+    os.chmod(path, 0o600)
+    if update_every:
+        schedule_updates(server, update_every, run_update)
+    print(f"Serving on {path}", flush=True)
+    signal.signal(signal.SIGTERM, lambda *_: server_exit())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if path.exists():
+            os.unlink(path)
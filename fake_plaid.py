@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# Local stand-in for the Plaid /transactions/sync endpoint, for load-testing
+# `tracker.py update` offline:
+#
+#   python fake_plaid.py --transactions 1000000 --latency-ms 80 --error-rate 0.02
+#   PLAID_HOST=http://127.0.0.1:8089 python tracker.py update --get-all --jobs 3
+#
+# With --record UPSTREAM it proxies to a real Plaid host and appends every
+# exchange to a cassette (db/plaid_cassette.jsonl by default, which git ignores:
+# it holds real account data); with --replay it answers from a cassette instead.
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+MERCHANTS = ["Uber", "Lyft", "Starbucks", "Whole Foods", "Amazon", "Shell", "Venmo", "Netflix", "Spotify", "Chipotle", "Trader Joe's", "Delta"]
+CATEGORIES = [
+    ("TRANSPORTATION", "TRANSPORTATION_TAXIS_AND_RIDE_SHARES"),
+    ("FOOD_AND_DRINK", "FOOD_AND_DRINK_COFFEE"),
+    ("FOOD_AND_DRINK", "FOOD_AND_DRINK_GROCERIES"),
+    ("GENERAL_MERCHANDISE", "GENERAL_MERCHANDISE_ONLINE_MARKETPLACES"),
+    ("ENTERTAINMENT", "ENTERTAINMENT_TV_AND_MOVIES"),
+    ("TRAVEL", "TRAVEL_FLIGHTS"),
+]
+# Request fields that carry credentials never reach a cassette
+SECRET_FIELDS = {"client_id", "secret", "access_token"}
+DEFAULT_CASSETTE = Path(__file__).resolve().parent / "db" / "plaid_cassette.jsonl"
+
+
+def token_key(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()[:12]
+
+
+class SyntheticItem:
+    # A deterministic event log per access token: `transactions` adds, then
+    # `modified` and `removed` deltas against earlier rows. Events are derived
+    # from their index, so millions of rows cost no memory.
+    def __init__(self, access_token: str, transactions: int, modified: int, removed: int, start: date):
+        self.seed = int(token_key(access_token), 16)
+        self.account_id = f"acct-{token_key(access_token)}"
+        self.transactions = transactions
+        self.modified = modified
+        self.removed = removed
+        self.start = start
+
+    def __len__(self):
+        return self.transactions + self.modified + self.removed
+
+    def transaction(self, i: int, revision: int = 0) -> dict:
+        rng = random.Random(self.seed * 1_000_003 + i)
+        merchant = rng.choice(MERCHANTS)
+        primary, detailed = rng.choice(CATEGORIES)
+        day = self.start + timedelta(days=i * 730 // max(self.transactions, 1))
+        moment = datetime(day.year, day.month, day.day, rng.randrange(24), rng.randrange(60), tzinfo=timezone.utc)
+        amount = round(rng.uniform(1, 250), 2) + revision
+        # Shaped to the SDK's Transaction schema: its deserializer rejects a null
+        # in any field that isn't nullable there, so optional fields are left out
+        return {
+            "account_id": self.account_id,
+            "account_owner": None,
+            "amount": amount,
+            "authorized_date": day.isoformat(),
+            "authorized_datetime": moment.isoformat(),
+            "category": None,
+            "category_id": None,
+            "check_number": None,
+            "counterparties": [],
+            "date": day.isoformat(),
+            "datetime": moment.isoformat(),
+            "iso_currency_code": "USD",
+            "location": {"address": None, "city": None, "country": None, "lat": None, "lon": None, "postal_code": None, "region": None, "store_number": None},
+            "logo_url": None,
+            "merchant_entity_id": None,
+            "merchant_name": merchant,
+            "name": f"{merchant.upper()} {rng.randrange(10**6):06d}",
+            "payment_channel": "in store",
+            "payment_meta": {"by_order_of": None, "payee": None, "payer": None, "payment_method": None, "payment_processor": None, "ppd_id": None, "reason": None, "reference_number": None},
+            "pending": False,
+            "pending_transaction_id": None,
+            "personal_finance_category": {"primary": primary, "detailed": detailed, "confidence_level": "HIGH"},
+            "transaction_code": "purchase",
+            "transaction_id": f"{self.account_id}-{i}",
+            "transaction_type": "place",
+            "unofficial_currency_code": None,
+            "website": None,
+        }
+
+    def event(self, n: int) -> tuple[str, dict]:
+        if n < self.transactions:
+            return "added", self.transaction(n)
+        n -= self.transactions
+        target = random.Random(self.seed + n).randrange(max(self.transactions, 1))
+        if n < self.modified:
+            return "modified", self.transaction(target, revision=1)
+        return "removed", {"account_id": self.account_id, "transaction_id": f"{self.account_id}-{target}"}
+
+    def page(self, offset: int, count: int) -> dict:
+        end = min(offset + count, len(self))
+        body = {"added": [], "modified": [], "removed": []}
+        for n in range(offset, end):
+            kind, payload = self.event(n)
+            body[kind].append(payload)
+        body.update(
+            accounts=[],
+            next_cursor=str(end),
+            has_more=end < len(self),
+            transactions_update_status="HISTORICAL_UPDATE_COMPLETE",
+        )
+        return body
+
+
+class FakePlaid:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.items = {}
+        self.lock = threading.Lock()
+        self.cassette = {}
+        self.record_file = None
+        if args.replay:
+            with open(args.replay) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.cassette.setdefault(entry["key"], []).append(entry)
+        if args.record:
+            Path(args.cassette).parent.mkdir(parents=True, exist_ok=True)
+            self.record_file = open(args.cassette, "a")
+
+    def item(self, access_token: str) -> SyntheticItem:
+        with self.lock:
+            if access_token not in self.items:
+                self.items[access_token] = SyntheticItem(
+                    access_token, self.args.transactions, self.args.modified, self.args.removed, date.fromisoformat(self.args.start),
+                )
+            return self.items[access_token]
+
+    def request_key(self, path: str, body: dict) -> str:
+        return f"{path} {token_key(body.get('access_token', ''))} {body.get('cursor') or ''}"
+
+    def error(self, status: int, code: str, message: str) -> tuple[int, dict]:
+        return status, {"error_type": "API_ERROR" if status >= 500 else "TRANSACTIONS_ERROR", "error_code": code, "error_message": message, "display_message": None}
+
+    def synthetic(self, path: str, body: dict) -> tuple[int, dict]:
+        if path != "/transactions/sync":
+            return self.error(404, "NOT_FOUND", f"{path} is not implemented by fake_plaid")
+        if self.args.latency_ms:
+            time.sleep(self.rng.expovariate(1 / self.args.latency_ms) / 1000)
+        with self.lock:
+            roll = self.rng.random()
+        if roll < self.args.error_rate / 2:
+            return self.error(429, "RATE_LIMIT_EXCEEDED", "rate limit exceeded")
+        if roll < self.args.error_rate:
+            return self.error(500, "INTERNAL_SERVER_ERROR", "injected failure")
+        if body.get("cursor") and roll < self.args.error_rate + self.args.mutation_rate:
+            return self.error(400, "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION", "underlying transaction data changed")
+        offset = int(body.get("cursor") or 0)
+        count = max(1, min(int(body.get("count", 100)), 500))
+        return 200, self.item(body["access_token"]).page(offset, count)
+
+    def replay(self, path: str, body: dict) -> tuple[int, dict]:
+        entries = self.cassette.get(self.request_key(path, body))
+        if not entries:
+            return self.error(404, "CASSETTE_MISS", f"no recorded response for {path} at cursor {body.get('cursor')!r}")
+        entry = entries.pop(0) if len(entries) > 1 else entries[0]
+        return entry["status"], entry["response"]
+
+    def record(self, path: str, raw: bytes, headers) -> tuple[int, dict]:
+        forward = {k: v for k, v in headers.items() if k.lower() in ("content-type", "plaid-client-id", "plaid-secret", "plaid-version")}
+        request = urllib.request.Request(self.args.record.rstrip("/") + path, data=raw, headers=forward, method="POST")
+        try:
+            with urllib.request.urlopen(request) as resp:
+                status, response = resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            status, response = e.code, json.loads(e.read() or b"{}")
+        body = json.loads(raw or b"{}")
+        entry = {
+            "key": self.request_key(path, body),
+            "request": {k: v for k, v in body.items() if k not in SECRET_FIELDS},
+            "status": status,
+            "response": response,
+        }
+        with self.lock:
+            self.record_file.write(json.dumps(entry) + "\n")
+            self.record_file.flush()
+        return status, response
+
+    def handle(self, path: str, raw: bytes, headers) -> tuple[int, dict]:
+        if self.args.record:
+            return self.record(path, raw, headers)
+        body = json.loads(raw or b"{}")
+        if self.args.replay:
+            return self.replay(path, body)
+        return self.synthetic(path, body)
+
+
+def make_handler(fake: FakePlaid):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            status, response = fake.handle(self.path, raw, self.headers)
+            response.setdefault("request_id", f"fake-{time.monotonic_ns()}")
+            payload = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            if fake.args.verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Fake Plaid /transactions/sync server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--transactions", type=int, default=10_000, help="Added transactions per access token")
+    parser.add_argument("--modified", type=int, default=0, help="Modified deltas after the adds")
+    parser.add_argument("--removed", type=int, default=0, help="Removed deltas after the modifications")
+    parser.add_argument("--start", default="2023-01-01", help="Date of the first synthetic transaction")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean (exponential) response latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 429/500")
+    parser.add_argument("--mutation-rate", type=float, default=0.0, help="Fraction of mid-pagination requests failing with MUTATION_DURING_PAGINATION")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", metavar="UPSTREAM", help="Proxy to this Plaid host and record to --cassette")
+    mode.add_argument("--replay", metavar="CASSETTE", help="Answer from a recorded cassette")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE, help="Where --record appends exchanges (keep it out of the repo: it holds real transactions)")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(FakePlaid(args)))
+    print(f"Fake Plaid listening on http://127.0.0.1:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
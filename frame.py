@@ -0,0 +1,118 @@
+import numpy as np
+
+from store import TransactionStore
+from query import Query
+
+
+FRAME_COLUMNS = ["datetime", "amount", "account", "my_category", "plaid_category", "name"]
+
+
+def encode(values: list) -> tuple[np.ndarray, list]:
+    # Dictionary-encode a column: codes[i] indexes into vocab
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=len(values))
+    return codes, list(lookup)
+
+
+class TransactionFrame:
+    # Column-oriented view of a slice of the ledger for get/summary. Numeric
+    # columns are float64 arrays, string columns are int32 codes plus a vocab.
+    def __init__(self, datetime, amount, account, my_category, plaid_category, name, vocabs):
+        self.datetime = datetime
+        self.amount = amount
+        self.account = account
+        self.my_category = my_category
+        self.plaid_category = plaid_category
+        self.name = name
+        self.vocabs = vocabs
+
+    @classmethod
+    def from_store(cls, db: TransactionStore, query: Query) -> "TransactionFrame":
+        rows = db.select_columns(query, FRAME_COLUMNS)
+        columns = list(zip(*rows)) if rows else [()] * len(FRAME_COLUMNS)
+        datetime, amount, account, my_category, plaid_category, name = columns
+        account_codes, account_vocab = encode(account)
+        my_category_codes, my_category_vocab = encode(my_category)
+        plaid_category_codes, plaid_category_vocab = encode(plaid_category)
+        return cls(
+            np.array(datetime, dtype=np.float64),
+            np.array(amount, dtype=np.float64),
+            account_codes,
+            my_category_codes,
+            plaid_category_codes,
+            np.array(name, dtype=object),
+            {"account": account_vocab, "my_category": my_category_vocab, "plaid_category": plaid_category_vocab},
+        )
+
+    def __len__(self):
+        return len(self.datetime)
+
+    def take(self, index) -> "TransactionFrame":
+        return TransactionFrame(
+            self.datetime[index],
+            self.amount[index],
+            self.account[index],
+            self.my_category[index],
+            self.plaid_category[index],
+            self.name[index],
+            self.vocabs,
+        )
+
+    def between(self, start_timestamp: float, end_timestamp: float) -> "TransactionFrame":
+        return self.take((self.datetime >= start_timestamp) & (self.datetime <= end_timestamp))
+
+    def where(self, column: str, value) -> "TransactionFrame":
+        vocab = self.vocabs[column]
+        if value not in vocab:
+            return self.take(np.zeros(len(self), dtype=bool))
+        return self.take(getattr(self, column) == vocab.index(value))
+
+    def sort_by_datetime(self, reverse: bool = False) -> "TransactionFrame":
+        order = np.argsort(self.datetime, kind="stable")
+        return self.take(order[::-1] if reverse else order)
+
+    def sum_by(self, column: str) -> dict:
+        vocab = self.vocabs[column]
+        totals = np.bincount(getattr(self, column), weights=self.amount, minlength=len(vocab))
+        present = np.bincount(getattr(self, column), minlength=len(vocab)) > 0
+        return {vocab[i]: float(totals[i]) for i in np.flatnonzero(present)}
+
+    def rows(self):
+        categories = self.vocabs["my_category"]
+        for i in range(len(self)):
+            yield float(self.datetime[i]), float(self.amount[i]), categories[self.my_category[i]], self.name[i]
+
+
+class CumulativeSums:
+    # Per-category prefix sums over time-sorted amounts. The total for any time
+    # range is two binary searches and a subtraction, so a whole trend table of
+    # buckets costs one searchsorted per category after a single sort.
+    def __init__(self, frame: TransactionFrame, column: str = "my_category"):
+        codes = getattr(frame, column)
+        order = np.lexsort((frame.datetime, codes))
+        codes = codes[order]
+        times = frame.datetime[order]
+        amounts = frame.amount[order]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        self.labels = []
+        self.times = []
+        self.sums = []
+        for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(codes)]))):
+            if start == end:
+                continue
+            self.labels.append(frame.vocabs[column][codes[start]])
+            self.times.append(times[start:end])
+            self.sums.append(np.concatenate(([0.0], np.cumsum(amounts[start:end]))))
+
+    def at(self, edges: np.ndarray) -> list[np.ndarray]:
+        # Cumulative total per category of everything before each edge
+        return [sums[np.searchsorted(times, edges, side="left")] for times, sums in zip(self.times, self.sums)]
+
+    def buckets(self, edges: np.ndarray, rolling: int = 1) -> dict:
+        # Totals for [edges[i], edges[i + 1]), or over the `rolling` buckets ending there
+        totals = {}
+        for label, cumulative in zip(self.labels, self.at(edges)):
+            ends = cumulative[1:]
+            starts = cumulative[np.maximum(np.arange(1, len(edges)) - rolling, 0)]
+            totals[label] = ends - starts
+        return totals
@@ -25,7 +25,7 @@ ENV_MAP = {
 }
 
 config = Configuration(
-    host=ENV_MAP[PLAID_ENV],
+    host=os.getenv("PLAID_HOST") or ENV_MAP[PLAID_ENV],
     api_key={"clientId": PLAID_CLIENT_ID, "secret": PLAID_SECRET},
 )
 api_client = ApiClient(config)
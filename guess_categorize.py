@@ -1,31 +1,12 @@
 #!/usr/bin/env python3
-import argparse
-from plaid.api import plaid_api
-import os
-from plaid.model.transactions_sync_request import TransactionsSyncRequest
-from dotenv import load_dotenv
-load_dotenv()
-from datetime import date, timedelta
-from dataclasses import asdict
-from utils import *
-from argparse import RawTextHelpFormatter
+import json
+from functools import lru_cache
+from pathlib import Path
 from typing import Callable, Optional
 
 
-MY_CARDS_VALS = [CardType.CHASEPRIME.value, CardType.BILT.value, CardType.VENMO.value]
-
-CARD_TYPE_MAP = {
-    CardType.CHASEPRIME.value: CardType.CHASEPRIME,
-    CardType.BILT.value: CardType.BILT,
-    CardType.VENMO.value: CardType.VENMO,
-}
-
-
-import json
+RULES_PATH = Path(__file__).parent / "db" / "my_rules.json"
 
-# Open and load the JSON file
-with open("./db/categories.json", "r") as file:
-    categories = json.load(file)
 
 def contains_rule(target: str, category: str) -> Callable[[str], Optional[str]]:
     target = target.lower()
@@ -46,21 +27,17 @@ def equal_rule(target: str, category: str) -> Callable[[str], Optional[str]]:
 
     return lambda name: category if name.lower() == target else None
 
-RULES = []
-
-with open("./db/my_rules.json", "r") as file:
-    my_rules = json.load(file)
-    for rule in my_rules["contains_rules"]:
-        RULES.append(contains_rule(rule["target"], rule["category"]))
-
+@lru_cache(maxsize=None)
+def get_rules() -> dict:
+    with open(RULES_PATH, "r") as file:
+        return json.load(file)
 
+@lru_cache(maxsize=None)
+def get_matcher():
+    # Compiled on first use so commands that never guess don't pay for it
+    from rule_matcher import RuleMatcher
+    return RuleMatcher(get_rules())
 
 
 def guess_category(name: str, merchant_name: str) -> str | None:
-    name = name.lower()
-
-    for rule_fn in RULES:
-        category = rule_fn(name)
-        if category:
-            return category
-    return None
\ No newline at end of file
+    return get_matcher().match(name, merchant_name)
@@ -1,6 +1,6 @@
-from dataclasses import dataclass
 from enum import Enum
 from abc import ABC, abstractmethod
+from sys import intern
 import json
 import os
 
@@ -11,19 +11,67 @@ class CardType(Enum):
     VENMO = "venmo"
 
 
-@dataclass
+def _intern(value):
+    return value if value is None else intern(value)
+
+
 class MyTransaction:
-    datetime: float # unix
-    amount: float
-    name: str
-    merchant_name: str
-    plaid_category: str
-    plaid_subcategory: str
-    account: str
-    transaction_id: str
-    is_categorized: bool
-    my_category: str | None = None
+    # A slotted record: no per-instance __dict__, and the low-cardinality strings
+    # (account, merchant, categories) are interned so a large result set shares
+    # one copy of each. Keeps the old dataclass's constructor, ==, and repr.
+    __slots__ = (
+        "datetime", # unix
+        "amount",
+        "name",
+        "merchant_name",
+        "plaid_category",
+        "plaid_subcategory",
+        "account",
+        "transaction_id",
+        "is_categorized",
+        "my_category",
+    )
+
+    def __init__(
+        self,
+        datetime: float,
+        amount: float,
+        name: str,
+        merchant_name: str,
+        plaid_category: str,
+        plaid_subcategory: str,
+        account: str,
+        transaction_id: str,
+        is_categorized: bool,
+        my_category: str | None = None,
+    ):
+        self.datetime = datetime
+        self.amount = amount
+        self.name = name
+        self.merchant_name = _intern(merchant_name)
+        self.plaid_category = _intern(plaid_category)
+        self.plaid_subcategory = _intern(plaid_subcategory)
+        self.account = _intern(account)
+        self.transaction_id = transaction_id
+        self.is_categorized = is_categorized
+        self.my_category = _intern(my_category)
+
+    def astuple(self) -> tuple:
+        return (
+            self.datetime, self.amount, self.name, self.merchant_name, self.plaid_category,
+            self.plaid_subcategory, self.account, self.transaction_id, self.is_categorized, self.my_category,
+        )
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    __hash__ = None
 
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in zip(self.__slots__, self.astuple()))
+        return f"MyTransaction({fields})"
 
 """
 
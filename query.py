@@ -0,0 +1,105 @@
+import copy
+
+
+class Query:
+    # Filters over the transactions table, built up fluently and compiled into a
+    # single WHERE clause, so any mix of accounts, dates, categories and extra
+    # predicates is answered in one pass over one handle:
+    #
+    #   Query().for_accounts(["BILT", "VENMO"]).between(start, end).amount_between(20, None).merchant("Uber")
+    #
+    # Every predicate also has a Python form (matches) for rows that come from
+    # somewhere other than SQLite, like the mmap'd snapshot.
+    def __init__(self):
+        self.accounts = None
+        self.start_timestamp = None
+        self.end_timestamp = None
+        self.category = None
+        self.uncategorized = False
+        self.predicates = []  # (sql, params, fn)
+
+    def copy(self) -> "Query":
+        other = copy.copy(self)
+        other.predicates = list(self.predicates)
+        return other
+
+    def for_accounts(self, accounts: list[str]) -> "Query":
+        self.accounts = list(accounts)
+        return self
+
+    def between(self, start_timestamp: float | None, end_timestamp: float | None) -> "Query":
+        self.start_timestamp = start_timestamp
+        self.end_timestamp = end_timestamp
+        return self
+
+    def in_category(self, category: str | None) -> "Query":
+        self.category = category
+        return self
+
+    def only_uncategorized(self, enabled: bool = True) -> "Query":
+        self.uncategorized = enabled
+        return self
+
+    def where(self, sql: str, params: list, fn = None) -> "Query":
+        # Escape hatch for new filters: an SQL fragment plus the same test on a
+        # MyTransaction. Without fn the filter only works against the store.
+        self.predicates.append((sql, list(params), fn))
+        return self
+
+    def amount_between(self, low: float | None = None, high: float | None = None) -> "Query":
+        if low is not None:
+            self.where("amount >= ?", [low], lambda tr: tr.amount >= low)
+        if high is not None:
+            self.where("amount <= ?", [high], lambda tr: tr.amount <= high)
+        return self
+
+    def merchant(self, merchant_name: str) -> "Query":
+        wanted = merchant_name.lower()
+        return self.where("merchant_name = ? COLLATE NOCASE", [merchant_name], lambda tr: (tr.merchant_name or "").lower() == wanted)
+
+    @property
+    def has_predicates(self) -> bool:
+        return bool(self.predicates)
+
+    def conditions(self) -> tuple[list[str], list]:
+        parts, params = [], []
+        if self.accounts is not None:
+            parts.append(f"account IN ({', '.join('?' * len(self.accounts))})")
+            params += self.accounts
+        if self.start_timestamp is not None:
+            parts.append("datetime >= ?")
+            params.append(self.start_timestamp)
+        if self.end_timestamp is not None:
+            parts.append("datetime <= ?")
+            params.append(self.end_timestamp)
+        if self.category is not None:
+            parts.append("my_category = ?")
+            params.append(self.category)
+        if self.uncategorized:
+            parts.append("my_category IS NULL")
+        for sql, predicate_params, _ in self.predicates:
+            parts.append(sql)
+            params += predicate_params
+        return parts, params
+
+    def clause(self) -> tuple[str, list]:
+        parts, params = self.conditions()
+        return (" WHERE " + " AND ".join(parts)) if parts else "", params
+
+    def matches(self, tr) -> bool:
+        if self.accounts is not None and tr.account not in self.accounts:
+            return False
+        if self.start_timestamp is not None and tr.datetime < self.start_timestamp:
+            return False
+        if self.end_timestamp is not None and tr.datetime > self.end_timestamp:
+            return False
+        if self.category is not None and tr.my_category != self.category:
+            return False
+        if self.uncategorized and tr.my_category is not None:
+            return False
+        for sql, _, fn in self.predicates:
+            if fn is None:
+                raise ValueError(f"Filter {sql!r} can only run in SQL")
+            if not fn(tr):
+                return False
+        return True
@@ -0,0 +1,70 @@
+from category_history import normalize_merchant
+
+
+# Rows closer together than this can pair up as a duplicate or a transfer
+DEFAULT_WINDOW_DAYS = 2
+# Summaries leave these out unless asked. A transfer is the same money seen from
+# both ends; a "duplicate" could still be two real purchases, so it is opt-in.
+DEFAULT_EXCLUDED_KINDS = ("transfer",)
+
+
+def merchant_key(name: str | None, merchant_name: str | None) -> str | None:
+    # The whole normalized merchant: "Whole Foods" and "Whole Earth" stay apart
+    return normalize_merchant(name, merchant_name)
+
+def payee_key(name: str | None, merchant_name: str | None) -> str | None:
+    # First word only, to spot a charge paying another account:
+    # "VENMO *ALEX 8554665" and "Venmo" both become "venmo"
+    key = normalize_merchant(name, merchant_name)
+    return key.split()[0] if key else None
+
+def account_key(account: str) -> str:
+    return account.lower()
+
+
+def find_duplicates(new: list, candidates: list, consumed: set[str], window_days: float = DEFAULT_WINDOW_DAYS) -> list[tuple[str, str, str]]:
+    # Hash join instead of comparing every pair: candidates are indexed by
+    # (amount in cents, time bucket, key) fingerprints, and each new row probes
+    # its own and the neighbouring buckets. Returns (tagged id, kept id, kind):
+    #   transfer   a card charge whose merchant is another account, e.g. the
+    #              Chase charge "VENMO *ALEX" that funded a Venmo payment
+    #   duplicate  the same merchant and amount posted on two accounts
+    # Each row pairs at most once; ids in `consumed` are already paired.
+    window = window_days * 86400
+    index = {}
+    for c in candidates:
+        if c.transaction_id in consumed:
+            continue
+        cents = round(c.amount * 100)
+        bucket = int(c.datetime // window)
+        index.setdefault((cents, bucket, "account", account_key(c.account)), []).append(c)
+        payee = payee_key(c.name, c.merchant_name)
+        if payee:
+            index.setdefault((cents, bucket, "payee", payee), []).append(c)
+            index.setdefault((cents, bucket, "merchant", merchant_key(c.name, c.merchant_name)), []).append(c)
+
+    taken = set(consumed)
+    tags = []
+    # Newest first, so of two duplicate postings the later one is tagged
+    for r in sorted(new, key=lambda tr: tr.datetime, reverse=True):
+        if r.transaction_id in taken:
+            continue
+        cents = round(r.amount * 100)
+        bucket = int(r.datetime // window)
+        payee = payee_key(r.name, r.merchant_name)
+        probes = [("payee", account_key(r.account), "transfer", False)]
+        if payee:
+            probes = [("account", payee, "transfer", True)] + probes + [("merchant", merchant_key(r.name, r.merchant_name), "duplicate", True)]
+        for field, value, kind, tag_self in probes:
+            match = next((
+                c
+                for b in (bucket - 1, bucket, bucket + 1)
+                for c in index.get((cents, b, field, value), ())
+                if c.account != r.account and c.transaction_id not in taken and abs(c.datetime - r.datetime) <= window
+            ), None)
+            if match is not None:
+                tagged, kept = (r, match) if tag_self else (match, r)
+                tags.append((tagged.transaction_id, kept.transaction_id, kind))
+                taken.update((r.transaction_id, match.transaction_id))
+                break
+    return tags
@@ -0,0 +1,160 @@
+import re
+from collections import deque
+
+
+class AhoCorasick:
+    # Multi-pattern substring automaton; each node remembers the best (lowest)
+    # rule priority among the patterns that end there or along its fail chain.
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+
+    def add(self, pattern: str, priority: int):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(None)
+            node = nxt
+        if self.best[node] is None or priority < self.best[node]:
+            self.best[node] = priority
+
+    def build(self):
+        pending = deque(self.goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for ch, nxt in self.goto[node].items():
+                pending.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                inherited = self.best[self.fail[nxt]]
+                if inherited is not None and (self.best[nxt] is None or inherited < self.best[nxt]):
+                    self.best[nxt] = inherited
+
+    def first_match(self, text: str) -> int | None:
+        goto, fail, best = self.goto, self.fail, self.best
+        node = 0
+        found = None
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            b = best[node]
+            if b is not None and (found is None or b < found):
+                found = b
+                if found == 0:
+                    break
+        return found
+
+
+def embeddable(part: str) -> bool:
+    try:
+        re.compile(part, re.IGNORECASE)
+    except re.error:
+        return False
+    return True
+
+
+class RuleMatcher:
+    # Compiles contains/equal/regex rules into one matcher. Rules keep the
+    # order they appear in my_rules.json and the earliest matching rule wins.
+    def __init__(self, my_rules: dict):
+        self.categories = []
+        self.contains = AhoCorasick()
+        self.equal = {}
+        regex_parts = []
+        # Rules that can't share the alternation, searched one by one in priority order
+        self.separate = []
+
+        for rule_type, rules in my_rules.items():
+            for rule in rules:
+                priority = len(self.categories)
+                self.categories.append(rule["category"].lower())
+                if rule_type == "contains_rules":
+                    self.contains.add(rule["target"].lower(), priority)
+                elif rule_type == "equal_rules":
+                    self.equal.setdefault(rule["target"].lower(), priority)
+                elif rule_type == "regex_rules":
+                    pattern = rule["pattern"]
+                    try:
+                        compiled = re.compile(pattern, re.IGNORECASE)
+                    except re.error as e:
+                        raise ValueError(f"Bad regex rule {pattern!r} in my_rules.json: {e}") from None
+                    # A lookahead per rule inside one alternation: the engine tries
+                    # alternatives in rule order, so lastgroup is the first rule that matches.
+                    # Groups would clash by name or shift numbered backreferences, and
+                    # inline flags only work at the start, so those rules run on their own.
+                    # [\s\S] rather than DOTALL so the rule's own dots mean what they do alone.
+                    part = f"(?=[\\s\\S]*?(?:{pattern}))(?P<r{priority}>)"
+                    if compiled.groups or not embeddable(part):
+                        self.separate.append((priority, compiled))
+                    else:
+                        regex_parts.append(part)
+                else:
+                    raise ValueError(f"Unknown rule type in my_rules.json: {rule_type}")
+
+        self.contains.build()
+        self.regex = re.compile("^(?:" + "|".join(regex_parts) + ")", re.IGNORECASE) if regex_parts else None
+
+    def first_match(self, text: str) -> int | None:
+        lowered = text.lower()
+        found = self.contains.first_match(lowered)
+        priority = self.equal.get(lowered)
+        if priority is not None and (found is None or priority < found):
+            found = priority
+        if self.regex is not None:
+            m = self.regex.match(text)
+            if m:
+                priority = int(m.lastgroup[1:])
+                if found is None or priority < found:
+                    found = priority
+        for priority, compiled in self.separate:
+            if found is not None and priority >= found:
+                break
+            if compiled.search(text):
+                found = priority
+                break
+        return found
+
+    def match(self, name: str | None, merchant_name: str | None = None) -> str | None:
+        found = None
+        for text in (name, merchant_name):
+            if not text:
+                continue
+            priority = self.first_match(text)
+            if priority is not None and (found is None or priority < found):
+                found = priority
+        return self.categories[found] if found is not None else None
+
+
+# Process-pool helpers for bulk categorization. Each worker compiles its own
+# matcher once from the rules dict instead of unpickling it per batch.
+_worker_matcher = None
+
+def _init_worker(my_rules: dict):
+    global _worker_matcher
+    _worker_matcher = RuleMatcher(my_rules)
+
+def _match_chunk(pairs: list[tuple[str, str]]) -> list[str | None]:
+    return [_worker_matcher.match(name, merchant_name) for name, merchant_name in pairs]
+
+def make_match_pool(my_rules: dict, jobs: int):
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(my_rules,))
+
+def match_many(matcher: RuleMatcher, pairs: list[tuple[str, str]], pool = None, chunk_size: int = 2000) -> list[str | None]:
+    if pool is None or len(pairs) < 2 * chunk_size:
+        return [matcher.match(name, merchant_name) for name, merchant_name in pairs]
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+    results = []
+    for part in pool.map(_match_chunk, chunks):
+        results.extend(part)
+    return results
@@ -0,0 +1,246 @@
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+
+from mytypes import MyTransaction
+from store import TransactionStore, COLUMNS
+from query import Query
+
+
+# Layout (little-endian), rows sorted by datetime:
+#   header     magic, ledger version, row count, string count, account string count, blob size
+#   datetime   f8 * rows
+#   amount     f8 * rows
+#   strings    u4 * rows for each STRING_COLUMNS entry (0 means None)
+#   flags      u1 * rows (is_categorized)
+#   offsets    u4 * (strings + 1) into the blob; account names are interned first
+#   blob       utf-8 string table
+MAGIC = b"TRKSNAP1"
+HEADER = struct.Struct("<8sqQIII")
+STRING_COLUMNS = ["account", "my_category", "name", "merchant_name", "plaid_category", "plaid_subcategory", "transaction_id"]
+
+
+# Rows per fetchmany batch while writing
+BATCH_ROWS = 50_000
+
+
+def _column_bytes(typecode: str, values) -> bytes:
+    column = array(typecode, values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+def write_snapshot(db: TransactionStore, path: Path | str) -> int:
+    # Streams the ledger in batches: every column slot is sized up front from the
+    # row count, so each batch is written straight into place and only the string
+    # table stays in memory. Transaction ids are unique per row, so they skip the
+    # interning dict and go straight to a spill file for the blob.
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with db.read(), os.fdopen(fd, "w+b") as f, tempfile.TemporaryFile() as blob:
+            version = db.ledger_version()
+            n = db.conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+            datetime_at = HEADER.size
+            amount_at = datetime_at + 8 * n
+            string_at = [amount_at + 8 * n + 4 * n * i for i in range(len(STRING_COLUMNS))]
+            flags_at = amount_at + 8 * n + 4 * n * len(STRING_COLUMNS)
+            offsets_at = flags_at + n
+
+            strings = {None: 0}
+            offsets = array("I", [0])
+            def add(value: str) -> int:
+                data = value.encode()
+                blob.write(data)
+                offsets.append(offsets[-1] + len(data))
+                return len(offsets) - 1
+            def intern(value):
+                string_id = strings.get(value)
+                if string_id is None:
+                    string_id = strings[value] = add(value)
+                return string_id
+
+            # Account names take the first ids so lookups only scan those
+            for (account,) in db.conn.execute("SELECT DISTINCT account FROM transactions ORDER BY account"):
+                intern(account)
+            account_strings = len(offsets) - 1
+
+            col = {name: i for i, name in enumerate(COLUMNS)}
+            string_cols = [col[name] for name in STRING_COLUMNS]
+            tid = col["transaction_id"]
+            cur = db.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM transactions ORDER BY datetime")
+            done = 0
+            while True:
+                rows = cur.fetchmany(BATCH_ROWS)
+                if not rows:
+                    break
+                if done + len(rows) > n:
+                    raise RuntimeError("ledger changed while writing the snapshot")
+                f.seek(datetime_at + 8 * done)
+                f.write(_column_bytes("d", (row[col["datetime"]] for row in rows)))
+                f.seek(amount_at + 8 * done)
+                f.write(_column_bytes("d", (row[col["amount"]] for row in rows)))
+                for at, i in zip(string_at, string_cols):
+                    f.seek(at + 4 * done)
+                    f.write(_column_bytes("I", (add(row[i]) if i == tid else intern(row[i]) for row in rows)))
+                f.seek(flags_at + done)
+                f.write(bytes(bool(row[col["is_categorized"]]) for row in rows))
+                done += len(rows)
+            if done != n:
+                raise RuntimeError("ledger changed while writing the snapshot")
+
+            f.seek(offsets_at)
+            f.write(_column_bytes("I", offsets))
+            blob.seek(0)
+            shutil.copyfileobj(blob, f)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, version, n, len(offsets) - 1, account_strings, offsets[-1]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return n
+
+
+class Snapshot:
+    # Read-only, mmap-backed view of a snapshot file. Nothing is decoded up
+    # front: range lookups bisect the datetime column in place and rows are
+    # materialized only as they are iterated.
+    def __init__(self, path: Path | str):
+        self.file = open(path, "rb")
+        try:
+            self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise
+        if len(self.buf) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a transaction snapshot")
+        magic, self.version, self.rows, self.string_count, self.account_strings, blob_size = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a transaction snapshot")
+
+        n = self.rows
+        self.datetime_at = HEADER.size
+        self.amount_at = self.datetime_at + 8 * n
+        self.string_at = {name: self.amount_at + 8 * n + 4 * n * i for i, name in enumerate(STRING_COLUMNS)}
+        self.flags_at = self.amount_at + 8 * n + 4 * n * len(STRING_COLUMNS)
+        self.offsets_at = self.flags_at + n
+        self.blob_at = self.offsets_at + 4 * (self.string_count + 1)
+        size, expected = len(self.buf), self.blob_at + blob_size
+        if size != expected:
+            self.close()
+            raise ValueError(f"{path} is truncated or corrupt ({size} bytes, header says {expected})")
+        self.cache = {0: None}
+
+    def close(self):
+        self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, string_id: int) -> str | None:
+        if string_id not in self.cache:
+            start, end = struct.unpack_from("<II", self.buf, self.offsets_at + 4 * (string_id - 1))
+            self.cache[string_id] = self.buf[self.blob_at + start:self.blob_at + end].decode()
+        return self.cache[string_id]
+
+    def account_id(self, account: str) -> int | None:
+        for i in range(1, self.account_strings + 1):
+            if self.string(i) == account:
+                return i
+        return None
+
+    def datetime(self, i: int) -> float:
+        return struct.unpack_from("<d", self.buf, self.datetime_at + 8 * i)[0]
+
+    def string_column(self, name: str, i: int) -> int:
+        return struct.unpack_from("<I", self.buf, self.string_at[name] + 4 * i)[0]
+
+    def bisect(self, timestamp: float, right: bool = False) -> int:
+        lo, hi = 0, self.rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self.datetime(mid)
+            if value < timestamp or (right and value == timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def row(self, i: int) -> MyTransaction:
+        string = self.string
+        at = 4 * i
+        return MyTransaction(
+            self.datetime(i),
+            struct.unpack_from("<d", self.buf, self.amount_at + 8 * i)[0],
+            string(struct.unpack_from("<I", self.buf, self.string_at["name"] + at)[0]),
+            string(struct.unpack_from("<I", self.buf, self.string_at["merchant_name"] + at)[0]),
+            string(struct.unpack_from("<I", self.buf, self.string_at["plaid_category"] + at)[0]),
+            string(struct.unpack_from("<I", self.buf, self.string_at["plaid_subcategory"] + at)[0]),
+            string(struct.unpack_from("<I", self.buf, self.string_at["account"] + at)[0]),
+            string(struct.unpack_from("<I", self.buf, self.string_at["transaction_id"] + at)[0]),
+            bool(self.buf[self.flags_at + i]),
+            string(struct.unpack_from("<I", self.buf, self.string_at["my_category"] + at)[0]),
+        )
+
+    def bounds(self, start_timestamp: float | None, end_timestamp: float | None) -> tuple[int, int]:
+        lo = 0 if start_timestamp is None else self.bisect(start_timestamp)
+        hi = self.rows if end_timestamp is None else self.bisect(end_timestamp, right=True)
+        return lo, hi
+
+    def indices(self, start_timestamp: float | None, end_timestamp: float | None, accounts: list[str] | None, category: str | None = None, reverse: bool = False):
+        # Walks the range lazily, oldest first or newest first. Only the datetime,
+        # account and (when filtering) my_category columns are touched here
+        lo, hi = self.bounds(start_timestamp, end_timestamp)
+        found = range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)
+        if accounts is not None:
+            account_ids = {self.account_id(account) for account in accounts} - {None}
+            found = (i for i in found if self.string_column("account", i) in account_ids)
+        if category is not None:
+            found = (i for i in found if self.string(self.string_column("my_category", i)) == category)
+        return found
+
+    def select(self, query: Query, reverse: bool = False):
+        # Row indices matching a Query, yielded in datetime order (newest first with
+        # reverse) so callers can stop early. Extra predicates need the decoded row.
+        found = self.indices(query.start_timestamp, query.end_timestamp, query.accounts, query.category, reverse)
+        if query.uncategorized:
+            found = (i for i in found if self.string_column("my_category", i) == 0)
+        if query.has_predicates:
+            found = (i for i in found if query.matches(self.row(i)))
+        return found
+
+    def count(self, query: Query) -> int:
+        if query.accounts is None and query.category is None and not query.uncategorized and not query.has_predicates:
+            lo, hi = self.bounds(query.start_timestamp, query.end_timestamp)
+            return hi - lo
+        return sum(1 for _ in self.select(query))
+
+    def between(self, start_timestamp: float, end_timestamp: float, accounts: list[str], reverse: bool = False):
+        for i in self.indices(start_timestamp, end_timestamp, accounts, reverse=reverse):
+            yield self.row(i)
+
+
+def open_fresh_snapshot(path: Path | str, version: int) -> Snapshot | None:
+    try:
+        snap = Snapshot(path)
+    except (OSError, ValueError):
+        return None
+    if snap.version != version:
+        snap.close()
+        return None
+    return snap
@@ -0,0 +1,709 @@
+import heapq
+import json
+import re
+import sqlite3
+import struct
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from operator import attrgetter
+from pathlib import Path
+from mytypes import MyTransaction
+from category_history import CategoryHistory, normalize_merchant
+from query import Query
+from reconcile import DEFAULT_WINDOW_DAYS, find_duplicates
+
+
+COLUMNS = [
+    "transaction_id",
+    "datetime",
+    "amount",
+    "name",
+    "merchant_name",
+    "plaid_category",
+    "plaid_subcategory",
+    "account",
+    "is_categorized",
+    "my_category",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    datetime REAL NOT NULL,
+    amount REAL NOT NULL,
+    name TEXT,
+    merchant_name TEXT,
+    plaid_category TEXT,
+    plaid_subcategory TEXT,
+    account TEXT NOT NULL,
+    is_categorized INTEGER NOT NULL DEFAULT 0,
+    my_category TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_datetime ON transactions (account, datetime);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    card TEXT PRIMARY KEY,
+    cursor TEXT,
+    backfill_complete INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS category_history (
+    key TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (key, category)
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    account TEXT NOT NULL,
+    category TEXT NOT NULL,
+    day TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (account, category, day)
+);
+CREATE INDEX IF NOT EXISTS idx_rollups_account_day ON rollups (account, day);
+CREATE TABLE IF NOT EXISTS search_terms (
+    term TEXT NOT NULL,
+    transaction_id TEXT NOT NULL,
+    PRIMARY KEY (term, transaction_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS duplicates (
+    transaction_id TEXT PRIMARY KEY,
+    duplicate_of TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_duplicates_of ON duplicates (duplicate_of);
+CREATE TABLE IF NOT EXISTS reconcile_pending (
+    transaction_id TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+INSERT_SQL = f"INSERT INTO transactions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+HISTORY_ADD_SQL = (
+    "INSERT INTO category_history (key, category, count) VALUES (?, ?, ?) "
+    "ON CONFLICT (key, category) DO UPDATE SET count = count + excluded.count"
+)
+# Daily totals per (account, category); uncategorized rows roll up under ''
+ROLLUP_SELECT = "SELECT account, COALESCE(my_category, ''), date(datetime, 'unixepoch', 'localtime'), {sign} * amount, {sign} FROM transactions"
+ROLLUP_ADD_SQL = (
+    "INSERT INTO rollups (account, category, day, total, count) {select} "
+    "ON CONFLICT (account, category, day) DO UPDATE SET total = total + excluded.total, count = count + excluded.count"
+)
+# Inverted index over name and merchant_name: one (term, transaction_id) pair per token.
+# Single characters are too common to be worth indexing; store numbers like "2975" are kept.
+SEARCH_TOKEN = re.compile(r"[a-z0-9]+")
+# Bump when search_terms changes so existing indexes are rebuilt
+SEARCH_INDEX_VERSION = "2"
+
+def search_terms(*texts: str | None) -> set[str]:
+    terms = set()
+    for text in texts:
+        if text:
+            terms.update(t for t in SEARCH_TOKEN.findall(text.lower()) if len(t) > 1)
+    return terms
+
+def query_terms(words: list[str], prefix: bool) -> list[str]:
+    # The same filter as search_terms, so a query never asks for a term the index
+    # skipped ("7-eleven" looks up "eleven"). The one exception is a single
+    # character at the very end in prefix mode, which is a term still being typed.
+    tokens = [t for word in words for t in SEARCH_TOKEN.findall(word.lower())]
+    terms = [t for t in tokens if len(t) > 1]
+    if prefix and tokens and len(tokens[-1]) == 1:
+        terms.append(tokens[-1])
+    return list(dict.fromkeys(terms))
+
+def prefix_range(prefix: str) -> tuple[str, str]:
+    # Every term starting with `prefix` sorts in [prefix, upper)
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+# Tagged rows stay in the ledger; summaries leave out the kinds asked for, but only
+# when the row they pair with is in the summary too, else nothing was counted twice
+TAGGED_SQL = (
+    "SELECT d.transaction_id FROM duplicates d JOIN transactions p ON p.transaction_id = d.duplicate_of "
+    "WHERE d.kind IN ({kinds}) AND p.account IN ({accounts})"
+)
+
+def not_tagged(accounts: list[str], kinds) -> tuple[str, list]:
+    kinds = list(kinds)
+    sql = TAGGED_SQL.format(kinds=', '.join('?' * len(kinds)), accounts=', '.join('?' * len(accounts)))
+    return f"transaction_id NOT IN ({sql})", kinds + list(accounts)
+
+UPSERT_SQL = f"INSERT OR REPLACE INTO transactions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+SELECT_SQL = f"SELECT {', '.join(COLUMNS)} FROM transactions"
+# Plaid "modified" rows refresh Plaid's fields but keep the user's categorization
+MODIFY_SQL = INSERT_SQL + " ON CONFLICT (transaction_id) DO UPDATE SET " + ", ".join(
+    f"{col} = excluded.{col}" for col in COLUMNS if col not in ("transaction_id", "is_categorized", "my_category")
+)
+
+
+# Hot codec between MyTransaction and a row in COLUMNS order: plain unpacking
+# and positional construction, no intermediate dicts
+def row_to_transaction(row) -> MyTransaction:
+    transaction_id, datetime, amount, name, merchant_name, plaid_category, plaid_subcategory, account, is_categorized, my_category = row
+    return MyTransaction(datetime, amount, name, merchant_name, plaid_category, plaid_subcategory, account, transaction_id, bool(is_categorized), my_category)
+
+def transaction_to_row(tr: MyTransaction) -> tuple:
+    return (tr.transaction_id, tr.datetime, tr.amount, tr.name, tr.merchant_name, tr.plaid_category, tr.plaid_subcategory, tr.account, tr.is_categorized, tr.my_category)
+
+
+# Writes append to the WAL (fsync'd per commit) instead of rewriting the file;
+# once this much log is waiting a background thread folds it into the main DB.
+WAL_COMPACT_BYTES = 16 * 1024 * 1024
+# Start of the wal-index (-shm) file: two copies of the 48-byte WalIndexHdr, then
+# WalCkptInfo. szPage and mxFrame sit at 14 and 16, nBackfill at 96, all native-endian.
+# See https://www.sqlite.org/walformat.html
+WAL_INDEX_HEADER = struct.Struct("=14xHI76xI")
+WAL_FRAME_HEADER_BYTES = 24
+
+
+def checkpoint(path: Path | str, mode: str = "PASSIVE") -> tuple[int, int, int]:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    finally:
+        conn.close()
+
+
+class TransactionStore:
+    def __init__(self, path: Path | str, compact_bytes: int = WAL_COMPACT_BYTES):
+        self.path = Path(path)
+        self.wal_path = self.path.with_name(self.path.name + "-wal")
+        self.shm_path = self.path.with_name(self.path.name + "-shm")
+        self.compact_bytes = compact_bytes
+        self.compactor = None
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = FULL")
+        # Checkpointing is left to maybe_compact so commits never pay for it inline
+        self.conn.execute("PRAGMA wal_autocheckpoint = 0")
+        # Below the trigger, so a WAL that was reset after a fold shrinks back under it
+        self.conn.execute(f"PRAGMA journal_size_limit = {compact_bytes // 2}")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        if self.compactor is not None:
+            self.compactor.join()
+        self.conn.close()
+
+    @contextmanager
+    def write(self):
+        with self.conn:
+            yield
+            # Bumped with every change so derived files (snapshots) can tell they are stale
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('ledger_version', 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+            )
+        self.maybe_compact()
+
+    @contextmanager
+    def read(self):
+        # One consistent view for multi-statement reads; WAL keeps writers unblocked
+        self.conn.execute("BEGIN")
+        try:
+            yield
+        finally:
+            self.conn.rollback()
+
+    def ledger_version(self) -> int:
+        return int(self.get_meta("ledger_version") or 0)
+
+    def wal_size(self) -> int:
+        return self.wal_path.stat().st_size if self.wal_path.exists() else 0
+
+    def pending_wal_bytes(self) -> int:
+        # Log not yet folded into the main DB: frames in the log (mxFrame) minus
+        # frames already checkpointed (nBackfill). The WAL file keeps its size after
+        # a checkpoint, so its size alone can't tell a folded log from a full one.
+        try:
+            with open(self.shm_path, "rb") as f:
+                header = f.read(WAL_INDEX_HEADER.size)
+        except OSError:
+            return self.wal_size()
+        if len(header) < WAL_INDEX_HEADER.size:
+            return self.wal_size()
+        page_size, max_frame, backfilled = WAL_INDEX_HEADER.unpack(header)
+        page_size = 65536 if page_size == 1 else page_size
+        return max(max_frame - backfilled, 0) * (page_size + WAL_FRAME_HEADER_BYTES)
+
+    def maybe_compact(self):
+        if self.wal_size() >= 4 * self.compact_bytes:
+            # The log only restarts from the top once a checkpoint has caught up with
+            # it, which a background PASSIVE checkpoint never does while this writer
+            # keeps appending. So past the cap, fold and truncate it here, between commits.
+            if self.compactor is not None:
+                self.compactor.join()
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            return
+        if self.pending_wal_bytes() < self.compact_bytes:
+            return
+        if self.compactor is not None and self.compactor.is_alive():
+            return
+        self.compactor = threading.Thread(target=checkpoint, args=(self.path,), daemon=True)
+        self.compactor.start()
+
+    def compact(self, vacuum: bool = False) -> int:
+        # Foreground compaction for `tracker.py compact`; returns frames folded in
+        if self.compactor is not None:
+            self.compactor.join()
+        _, _, checkpointed = self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        if vacuum:
+            self.conn.execute("VACUUM")
+        return checkpointed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.write():
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def migrate_from_tinydb(self, json_path: Path | str) -> int:
+        # One-time import of the old TinyDB ledger ({"_default": {"1": {...}, ...}})
+        json_path = Path(json_path)
+        if self.get_meta("migrated_from_tinydb") or not json_path.exists():
+            return 0
+
+        with open(json_path, "r") as f:
+            text = f.read()
+        data = json.loads(text) if text.strip() else {}
+        docs = data.get("_default", {}).values()
+
+        with self.write():
+            cur = self.conn.executemany(
+                INSERT_SQL.replace("INSERT", "INSERT OR IGNORE", 1),
+                (transaction_to_row(MyTransaction(**doc)) for doc in docs),
+            )
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_tinydb', ?)", (str(json_path),))
+        return cur.rowcount
+
+    def migrate_last_syncs(self, json_path: Path | str) -> int:
+        json_path = Path(json_path)
+        if self.get_meta("migrated_last_syncs") or not json_path.exists():
+            return 0
+
+        with open(json_path, "r") as f:
+            text = f.read()
+        data = json.loads(text) if text.strip() else {}
+
+        with self.write():
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO cursors (card, cursor) VALUES (?, ?)",
+                data.items(),
+            )
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_last_syncs', ?)", (str(json_path),))
+        return len(data)
+
+    def get_cursor(self, card: str) -> str | None:
+        row = self.conn.execute("SELECT cursor FROM cursors WHERE card = ?", (card,)).fetchone()
+        return row[0] if row else None
+
+    def is_backfill_complete(self, card: str) -> bool:
+        row = self.conn.execute("SELECT backfill_complete FROM cursors WHERE card = ?", (card,)).fetchone()
+        return bool(row[0]) if row else True
+
+    def start_backfill(self, card: str):
+        with self.write():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cursors (card, cursor, backfill_complete) VALUES (?, NULL, 0)",
+                (card,),
+            )
+
+    def _set_cursor(self, card: str, cursor: str | None, complete: bool):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cursors (card, cursor, backfill_complete) VALUES (?, ?, ?)",
+            (card, cursor, complete),
+        )
+
+    def exists(self, transaction_id: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM transactions WHERE transaction_id = ?", (transaction_id,)).fetchone()
+        return row is not None
+
+    def insert(self, tr: MyTransaction):
+        with self.write():
+            self.conn.execute(INSERT_SQL, transaction_to_row(tr))
+            self._rollup([tr.transaction_id], 1)
+            self._index_terms([tr.transaction_id], 1)
+            self._queue_reconcile([tr.transaction_id])
+
+    def replace(self, tr: MyTransaction):
+        with self.write():
+            self._rollup([tr.transaction_id], -1)
+            self._index_terms([tr.transaction_id], -1)
+            self.conn.execute(UPSERT_SQL, transaction_to_row(tr))
+            self._rollup([tr.transaction_id], 1)
+            self._index_terms([tr.transaction_id], 1)
+            self._untag([tr.transaction_id])
+            self._queue_reconcile([tr.transaction_id])
+
+    def _rollup(self, transaction_ids: list[str], sign: int):
+        # Call with -1 before rows change or disappear and +1 after they are written
+        select = ROLLUP_SELECT.format(sign=sign)
+        for i in range(0, len(transaction_ids), 900):
+            chunk = transaction_ids[i:i + 900]
+            self.conn.execute(
+                ROLLUP_ADD_SQL.format(select=select + f" WHERE transaction_id IN ({', '.join('?' * len(chunk))})"),
+                chunk,
+            )
+        if sign < 0:
+            self.conn.execute("DELETE FROM rollups WHERE count <= 0")
+
+    def _index_terms(self, transaction_ids: list[str], sign: int):
+        # Same contract as _rollup: -1 before rows change or disappear, +1 after they are written
+        pairs = [
+            (term, transaction_id)
+            for transaction_id, name, merchant_name in self._fetch_by_ids("transaction_id, name, merchant_name", transaction_ids)
+            for term in search_terms(name, merchant_name)
+        ]
+        if sign > 0:
+            self.conn.executemany("INSERT OR IGNORE INTO search_terms (term, transaction_id) VALUES (?, ?)", pairs)
+        else:
+            self.conn.executemany("DELETE FROM search_terms WHERE term = ? AND transaction_id = ?", pairs)
+
+    def build_search_index(self) -> bool:
+        if self.get_meta("search_index_built") == SEARCH_INDEX_VERSION:
+            return False
+        with self.write():
+            self.conn.execute("DELETE FROM search_terms")
+            cur = self.conn.execute("SELECT transaction_id, name, merchant_name FROM transactions")
+            while True:
+                rows = cur.fetchmany(5000)
+                if not rows:
+                    break
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO search_terms (term, transaction_id) VALUES (?, ?)",
+                    ((term, transaction_id) for transaction_id, name, merchant_name in rows for term in search_terms(name, merchant_name)),
+                )
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search_index_built', ?)", (SEARCH_INDEX_VERSION,))
+        return True
+
+    def search(self, words: list[str], query: Query | None = None, prefix: bool = True, limit: int | None = None) -> list[MyTransaction]:
+        # Each word narrows the hits to transactions with a term equal to (or starting
+        # with) it; the Query's filters only run on those hits, newest first
+        terms = query_terms(words, prefix)
+        if not terms:
+            return []
+        lookups, params = [], []
+        for term in terms:
+            if prefix:
+                lookups.append("SELECT transaction_id FROM search_terms WHERE term >= ? AND term < ?")
+                params += prefix_range(term)
+            else:
+                lookups.append("SELECT transaction_id FROM search_terms WHERE term = ?")
+                params.append(term)
+        conditions, filter_params = (query or Query()).conditions()
+        sql = SELECT_SQL + f" WHERE transaction_id IN ({' INTERSECT '.join(lookups)})"
+        sql += "".join(f" AND {condition}" for condition in conditions)
+        sql += " ORDER BY datetime DESC"
+        params += filter_params
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [row_to_transaction(row) for row in self.conn.execute(sql, params)]
+
+    def build_rollups(self) -> bool:
+        if self.get_meta("rollups_built"):
+            return False
+        with self.write():
+            self.conn.execute("DELETE FROM rollups")
+            self.conn.execute(ROLLUP_ADD_SQL.format(select=ROLLUP_SELECT.format(sign=1) + " WHERE true"))
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollups_built', '1')")
+        return True
+
+    def summary(self, accounts: list[str], start_day: str, end_day: str, exclude_kinds = ()) -> tuple[dict[str | None, float], int]:
+        # start_day/end_day are inclusive ISO dates
+        placeholders = ', '.join('?' * len(accounts))
+        rows = self.conn.execute(
+            f"SELECT category, SUM(total), SUM(count) FROM rollups WHERE account IN ({placeholders}) "
+            "AND day >= ? AND day <= ? GROUP BY category ORDER BY category",
+            [*accounts, start_day, end_day],
+        )
+        totals = {}
+        counts = {}
+        for category, total, n in rows:
+            totals[category or None] = total
+            counts[category or None] = n
+        if exclude_kinds:
+            # Rollups count every row; take the tagged ones back out, reading only those
+            kinds = list(exclude_kinds)
+            rows = self.conn.execute(
+                "SELECT COALESCE(t.my_category, ''), SUM(t.amount), COUNT(*) FROM duplicates d "
+                "JOIN transactions t ON t.transaction_id = d.transaction_id JOIN transactions p ON p.transaction_id = d.duplicate_of "
+                f"WHERE d.kind IN ({', '.join('?' * len(kinds))}) AND t.account IN ({placeholders}) AND p.account IN ({placeholders}) "
+                "AND date(t.datetime, 'unixepoch', 'localtime') BETWEEN ? AND ? GROUP BY 1",
+                [*kinds, *accounts, *accounts, start_day, end_day],
+            )
+            for category, total, n in rows:
+                totals[category or None] -= total
+                counts[category or None] -= n
+                if counts[category or None] <= 0:
+                    del totals[category or None], counts[category or None]
+        return totals, sum(counts.values())
+
+    def existing_ids(self, transaction_ids) -> set[str]:
+        transaction_ids = list(transaction_ids)
+        found = set()
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(transaction_ids), 900):
+            chunk = transaction_ids[i:i + 900]
+            rows = self.conn.execute(
+                f"SELECT transaction_id FROM transactions WHERE transaction_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            found.update(row[0] for row in rows)
+        return found
+
+    def _upsert(self, transactions: list[MyTransaction], replace_if_exists: bool) -> tuple[int, int]:
+        known = self.existing_ids(tr.transaction_id for tr in transactions)
+        inserts = []
+        replacements = []
+        skipped = 0
+        for tr in transactions:
+            if tr.transaction_id not in known:
+                known.add(tr.transaction_id)
+                inserts.append(tr)
+            elif replace_if_exists:
+                replacements.append(tr)
+            else:
+                skipped += 1
+
+        replaced_ids = [tr.transaction_id for tr in replacements]
+        written_ids = [tr.transaction_id for tr in inserts] + replaced_ids
+        self._rollup(replaced_ids, -1)
+        self._index_terms(replaced_ids, -1)
+        self.conn.executemany(INSERT_SQL, (transaction_to_row(tr) for tr in inserts))
+        self.conn.executemany(UPSERT_SQL, (transaction_to_row(tr) for tr in replacements))
+        self._rollup(written_ids, 1)
+        self._index_terms(written_ids, 1)
+        self._untag(replaced_ids)
+        self._queue_reconcile(written_ids)
+        return len(inserts) + len(replacements), skipped
+
+    def upsert_many(self, transactions: list[MyTransaction], replace_if_exists: bool = False) -> tuple[int, int]:
+        with self.write():
+            return self._upsert(transactions, replace_if_exists)
+
+    def _apply_page(self, card, added, modified, removed, next_cursor, has_more, replace_if_exists) -> tuple[int, int]:
+        count, skipped = self._upsert(added, replace_if_exists)
+        modified_ids = [tr.transaction_id for tr in modified]
+        self._rollup(modified_ids + removed, -1)
+        self._index_terms(modified_ids + removed, -1)
+        self.conn.executemany(MODIFY_SQL, (transaction_to_row(tr) for tr in modified))
+        self.conn.executemany("DELETE FROM transactions WHERE transaction_id = ?", ((tid,) for tid in removed))
+        self._rollup(modified_ids, 1)
+        self._index_terms(modified_ids, 1)
+        self._untag(modified_ids + removed)
+        self._queue_reconcile(modified_ids)
+        complete = self.is_backfill_complete(card) or not has_more
+        self._set_cursor(card, next_cursor, complete)
+        return count, skipped
+
+    def apply_sync_page(
+        self,
+        card: str,
+        added: list[MyTransaction],
+        modified: list[MyTransaction],
+        removed: list[str],
+        next_cursor: str,
+        has_more: bool,
+        replace_if_exists: bool = False,
+    ) -> tuple[int, int]:
+        # Rows and the cursor that produced them commit together, so a crash
+        # leaves the store at a page boundary that the next sync resumes from
+        with self.write():
+            return self._apply_page(card, added, modified, removed, next_cursor, has_more, replace_if_exists)
+
+    def apply_sync_pages(self, pages: list[tuple], replace_if_exists: bool = False) -> list[tuple[int, int]]:
+        # Several (card, added, modified, removed, next_cursor, has_more) pages in
+        # one commit; each card's cursor still lands with the rows it produced
+        with self.write():
+            return [self._apply_page(*page, replace_if_exists) for page in pages]
+
+    def _queue_reconcile(self, transaction_ids: list[str]):
+        self.conn.executemany("INSERT OR IGNORE INTO reconcile_pending (transaction_id) VALUES (?)", ((tid,) for tid in transaction_ids))
+
+    def _untag(self, transaction_ids: list[str]):
+        # Rows that changed or disappeared lose their pairing; their partners go back in the queue
+        partners = []
+        for i in range(0, len(transaction_ids), 900):
+            chunk = transaction_ids[i:i + 900]
+            placeholders = ', '.join('?' * len(chunk))
+            pairs = self.conn.execute(
+                f"SELECT transaction_id, duplicate_of FROM duplicates WHERE transaction_id IN ({placeholders}) OR duplicate_of IN ({placeholders})",
+                chunk + chunk,
+            ).fetchall()
+            self.conn.executemany("DELETE FROM duplicates WHERE transaction_id = ?", ((tagged,) for tagged, _ in pairs))
+            partners += [tid for pair in pairs for tid in pair]
+        self._queue_reconcile(partners)
+
+    def requeue_duplicates(self):
+        # Drop every tag and queue the whole ledger; reconcile_duplicates works through it
+        with self.write():
+            self.conn.execute("DELETE FROM duplicates")
+            self.conn.execute("INSERT OR IGNORE INTO reconcile_pending (transaction_id) SELECT transaction_id FROM transactions")
+
+    def build_duplicates(self) -> bool:
+        if self.get_meta("duplicates_built"):
+            return False
+        self.requeue_duplicates()
+        self.set_meta("duplicates_built", "1")
+        return True
+
+    def reconcile_duplicates(self, window_days: float = DEFAULT_WINDOW_DAYS, batch_size: int = 20000) -> dict[str, int]:
+        # Pairs queued rows against everything within the window of them, a batch at a time
+        tagged = {}
+        with self.write():
+            self.conn.execute("DELETE FROM reconcile_pending WHERE transaction_id NOT IN (SELECT transaction_id FROM transactions)")
+        accounts = [row[0] for row in self.conn.execute("SELECT DISTINCT account FROM transactions")]
+        window = window_days * 86400
+        while True:
+            new = [row_to_transaction(row) for row in self.conn.execute(
+                SELECT_SQL + " JOIN reconcile_pending USING (transaction_id) ORDER BY datetime DESC LIMIT ?", (batch_size,),
+            )]
+            if not new:
+                return tagged
+            start = min(tr.datetime for tr in new) - window
+            end = max(tr.datetime for tr in new) + window
+            candidates = list(self.select(Query().for_accounts(accounts).between(start, end)))
+            consumed = {tid for pair in self.conn.execute("SELECT transaction_id, duplicate_of FROM duplicates") for tid in pair}
+            tags = find_duplicates(new, candidates, consumed, window_days)
+            with self.write():
+                self.conn.executemany("INSERT OR REPLACE INTO duplicates (transaction_id, duplicate_of, kind) VALUES (?, ?, ?)", tags)
+                self.conn.executemany("DELETE FROM reconcile_pending WHERE transaction_id = ?", ((tr.transaction_id,) for tr in new))
+            for _, _, kind in tags:
+                tagged[kind] = tagged.get(kind, 0) + 1
+
+    def duplicate_pairs(self, query: Query | None = None) -> list[tuple[str, MyTransaction, MyTransaction]]:
+        # (kind, tagged row, the row it duplicates) for tagged rows matching the query, newest first
+        where, params = (query or Query()).clause()
+        rows = self.conn.execute(
+            f"SELECT d.kind, {', '.join('t.' + col for col in COLUMNS)}, {', '.join('k.' + col for col in COLUMNS)} "
+            f"FROM duplicates d JOIN (SELECT * FROM transactions{where}) t ON t.transaction_id = d.transaction_id "
+            "JOIN transactions k ON k.transaction_id = d.duplicate_of ORDER BY t.datetime DESC",
+            params,
+        )
+        n = len(COLUMNS)
+        return [(row[0], row_to_transaction(row[1:1 + n]), row_to_transaction(row[1 + n:])) for row in rows]
+
+    def _fetch_by_ids(self, columns: str, transaction_ids: list[str]) -> list[tuple]:
+        found = []
+        for i in range(0, len(transaction_ids), 900):
+            chunk = transaction_ids[i:i + 900]
+            found.extend(self.conn.execute(
+                f"SELECT {columns} FROM transactions WHERE transaction_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ))
+        return found
+
+    def set_category(self, transaction_id: str, category: str | None):
+        self.set_categories([(transaction_id, category)])
+
+    def set_categories(self, assignments: list[tuple[str, str | None]], learn: bool = True):
+        # learn=False writes categories without counting them as answers in category_history
+        new_categories = dict(assignments)
+        with self.write():
+            old_rows = self._fetch_by_ids("transaction_id, name, merchant_name, my_category", list(new_categories))
+            changed_ids = [row[0] for row in old_rows if row[3] != new_categories[row[0]]]
+            self._rollup(changed_ids, -1)
+            self.conn.executemany(
+                "UPDATE transactions SET my_category = ? WHERE transaction_id = ?",
+                ((category, transaction_id) for transaction_id, category in new_categories.items()),
+            )
+            self._rollup(changed_ids, 1)
+            if not learn:
+                return
+            deltas = {}
+            for transaction_id, name, merchant_name, old_category in old_rows:
+                new_category = new_categories[transaction_id]
+                key = normalize_merchant(name, merchant_name)
+                if key is None or old_category == new_category:
+                    continue
+                if old_category is not None:
+                    deltas[(key, old_category)] = deltas.get((key, old_category), 0) - 1
+                if new_category is not None:
+                    deltas[(key, new_category)] = deltas.get((key, new_category), 0) + 1
+            self.conn.executemany(HISTORY_ADD_SQL, ((key, category, delta) for (key, category), delta in deltas.items() if delta))
+            self.conn.execute("DELETE FROM category_history WHERE count <= 0")
+
+    def build_category_history(self) -> bool:
+        # One scan of the categorized rows the first time; set_categories keeps it current after that
+        if self.get_meta("category_history_built"):
+            return False
+        counts = {}
+        for name, merchant_name, category in self.conn.execute(
+            "SELECT name, merchant_name, my_category FROM transactions WHERE my_category IS NOT NULL"
+        ):
+            key = normalize_merchant(name, merchant_name)
+            if key is not None:
+                counts[(key, category)] = counts.get((key, category), 0) + 1
+        with self.write():
+            self.conn.execute("DELETE FROM category_history")
+            self.conn.executemany(HISTORY_ADD_SQL, ((key, category, n) for (key, category), n in counts.items()))
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('category_history_built', '1')")
+        return True
+
+    def load_category_history(self) -> CategoryHistory:
+        counts = {}
+        for key, category, count in self.conn.execute("SELECT key, category, count FROM category_history"):
+            counts.setdefault(key, {})[category] = count
+        return CategoryHistory(counts)
+
+    def _select_one(self, query: Query, newest_first: bool | None, limit: int | None, batch_size: int):
+        where, params = query.clause()
+        sql = SELECT_SQL + where
+        if newest_first is not None:
+            sql += " ORDER BY datetime DESC" if newest_first else " ORDER BY datetime"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        cur = self.conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield row_to_transaction(row)
+
+    def select(self, query: Query, newest_first: bool | None = None, limit: int | None = None, batch_size: int = 1000):
+        # Unordered, every account comes out of one statement. For time order over
+        # several accounts, each account streams off idx_transactions_account_datetime
+        # and a heap merge interleaves them, instead of SQLite sorting the whole
+        # range in a temp B-tree before returning the first row.
+        if newest_first is None or query.accounts is None or len(query.accounts) <= 1:
+            yield from self._select_one(query, newest_first, limit, batch_size)
+            return
+        streams = [self._select_one(query.copy().for_accounts([account]), newest_first, limit, batch_size) for account in query.accounts]
+        try:
+            yield from islice(heapq.merge(*streams, key=attrgetter("datetime"), reverse=newest_first), limit)
+        finally:
+            for stream in streams:
+                stream.close()
+
+    def select_batches(self, query: Query, batch_size: int = 5000):
+        where, params = query.clause()
+        cur = self.conn.execute(SELECT_SQL + where, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [row_to_transaction(row) for row in rows]
+
+    def select_columns(self, query: Query, columns: list[str]) -> list[tuple]:
+        if not set(columns) <= set(COLUMNS):
+            raise ValueError(f"Unknown columns: {set(columns) - set(COLUMNS)}")
+        where, params = query.clause()
+        return self.conn.execute(f"SELECT {', '.join(columns)} FROM transactions" + where, params).fetchall()
+
+    def count(self, query: Query) -> int:
+        where, params = query.clause()
+        return self.conn.execute("SELECT COUNT(*) FROM transactions" + where, params).fetchone()[0]
@@ -0,0 +1,260 @@
+# Plaid sync path. Kept out of utils so read-only commands never import the Plaid SDK.
+import plaid
+from plaid.api import plaid_api
+import os
+import plaid.model
+import plaid.model.transaction
+from plaid.model.transactions_sync_request import TransactionsSyncRequest
+from dotenv import load_dotenv
+load_dotenv()
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from mytypes import MyTransaction, CardType
+from utils import open_store
+from sync_scheduler import SyncScheduler, SyncMutationError
+from timings import phase, timed
+
+
+# Pages fetched ahead of conversion, and converted pages queued ahead of the DB writer
+PIPELINE_DEPTH = 4
+# Pages the writer folds into one commit when it has fallen behind
+WRITE_BATCH_PAGES = 8
+MAX_PAGINATION_RESTARTS = 3
+
+def get_access_token(card_type: CardType) -> str:
+    print(f"Getting access token for {card_type.name}")
+    return os.getenv(f"PLAID_{card_type.name}_ACCESS_TOKEN")
+
+def convert_to_mytransaction(plaid_transaction: plaid.model.transaction.Transaction, card: CardType) -> MyTransaction:
+    date_time = None
+    if plaid_transaction["datetime"] is not None:
+        date_time = plaid_transaction["datetime"]
+    else:
+        d = plaid_transaction["date"]
+        date_time = datetime.combine(d, datetime.min.time())
+
+    date_time = date_time.timestamp()
+
+    my_transaction = MyTransaction(
+        datetime=date_time,
+        amount=plaid_transaction["amount"],
+        name=plaid_transaction["name"],
+        merchant_name=plaid_transaction["merchant_name"],
+        plaid_category=plaid_transaction["personal_finance_category"]["primary"],
+        plaid_subcategory=plaid_transaction["personal_finance_category"]["detailed"],
+        account=card.name,
+        transaction_id=plaid_transaction["transaction_id"],
+        is_categorized=False,
+        my_category=None
+    )
+
+    return my_transaction
+
+
+def plaid_host() -> str:
+    # PLAID_HOST points sync at another server, e.g. fake_plaid.py or a replayed cassette
+    return os.getenv("PLAID_HOST") or plaid.Environment.Production
+
+def make_plaid_client(pool_size: int = 1) -> plaid_api.PlaidApi:
+    configuration = plaid.Configuration(
+        host=plaid_host(),
+        api_key={
+            'clientId': os.getenv("PLAID_CLIENT_ID"),
+            'secret': os.getenv("PLAID_SECRET")
+        }
+    )
+    # One keep-alive connection per concurrent worker sharing this client
+    configuration.connection_pool_maxsize = max(configuration.connection_pool_maxsize, pool_size)
+    return plaid_api.PlaidApi(plaid.ApiClient(configuration))
+
+def fetch_sync_responses(client: plaid_api.PlaidApi, card: CardType, cursor: str | None, scheduler: SyncScheduler | None = None):
+    access_token = get_access_token(card)
+    if access_token is None:
+        raise ValueError(f"Access token for {card} is not set in environment variables.")
+    if scheduler is None:
+        scheduler = SyncScheduler()
+
+    original_cursor = cursor
+    restarts = 0
+    has_more = True
+    while has_more:
+        count = scheduler.page_size(card.name)
+        if cursor is None:
+            request = TransactionsSyncRequest(access_token=access_token, count=count)
+        else:
+            request = TransactionsSyncRequest(access_token=access_token, count=count, cursor=cursor)
+
+        try:
+            with phase("plaid.transactions_sync"):
+                response = scheduler.call(card.name, lambda: client.transactions_sync(request))
+        except SyncMutationError:
+            # Plaid requires restarting the whole pagination loop. Pages already
+            # committed are replayed as idempotent upserts/deletes.
+            restarts += 1
+            if restarts > MAX_PAGINATION_RESTARTS:
+                raise
+            print(f"{card.name} changed during pagination, restarting from the original cursor.")
+            cursor = original_cursor
+            continue
+        cursor = response['next_cursor']
+        has_more = response['has_more']
+        yield response
+
+@timed("plaid.convert")
+def convert_sync_response(response, card: CardType):
+    added = [convert_to_mytransaction(tr, card) for tr in response['added']]
+    modified = [convert_to_mytransaction(tr, card) for tr in response['modified']]
+    removed = [tr['transaction_id'] for tr in response['removed']]
+    return added, modified, removed, response['next_cursor'], response['has_more']
+
+def get_transaction_pages_from_plaid(client: plaid_api.PlaidApi, card: CardType, cursor: str | None, scheduler: SyncScheduler | None = None):
+    for response in prefetch(fetch_sync_responses(client, card, cursor, scheduler)):
+        yield convert_sync_response(response, card)
+
+def prefetch(items, depth = PIPELINE_DEPTH):
+    # Runs `items` in a background thread, at most `depth` ahead of the consumer
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+    failure = []
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            buffer.put(done)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        stop.set()
+        # Unblock the producer if it is waiting on a full buffer
+        while producer.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                producer.join(0.01)
+    if failure:
+        raise failure[0]
+
+
+class SyncWriter(threading.Thread):
+    # Single owner of the store during a sync; workers hand pages over a bounded queue
+    def __init__(self, replace_if_exists = False, max_pending_pages = PIPELINE_DEPTH):
+        super().__init__(daemon=True)
+        self.replace_if_exists = replace_if_exists
+        self.pages = queue.Queue(maxsize=max_pending_pages)
+        self.stats = {}
+        self.error = None
+
+    def submit(self, card: CardType, page):
+        if self.error is not None:
+            raise RuntimeError(f"DB writer failed: {self.error}")
+        self.pages.put((card, page))
+
+    def finish(self):
+        self.pages.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        db = None
+        try:
+            db = open_store()
+        except Exception as e:
+            # Still drain below, so workers blocked in submit() get the error instead of hanging
+            self.error = e
+        try:
+            finished = False
+            while not finished:
+                batch = [self.pages.get()]
+                # Whatever else is already queued goes into the same commit
+                while batch[-1] is not None and len(batch) < WRITE_BATCH_PAGES:
+                    try:
+                        batch.append(self.pages.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    batch.pop()
+                    finished = True
+                if self.error is not None or not batch:
+                    continue
+                try:
+                    with phase("db.apply_sync_pages"):
+                        results = db.apply_sync_pages(
+                            [(card.name.lower(), *page) for card, page in batch],
+                            replace_if_exists=self.replace_if_exists,
+                        )
+                except Exception as e:
+                    self.error = e
+                    continue
+                for (card, (added, modified, removed, next_cursor, has_more)), (count, skipped) in zip(batch, results):
+                    stats = self.stats.setdefault(card, [0, 0, 0, 0])
+                    stats[0] += count
+                    stats[1] += skipped
+                    stats[2] += len(modified)
+                    stats[3] += len(removed)
+        finally:
+            if db is not None:
+                db.close()
+
+def get_start_cursors(cards: list[CardType], get_all = False) -> dict[CardType, str | None]:
+    db = open_store()
+    cursors = {}
+    for card in cards:
+        key = card.name.lower()
+        if get_all and db.is_backfill_complete(key):
+            db.start_backfill(key)
+        elif not db.is_backfill_complete(key):
+            print(f"Resuming interrupted backfill for {card.name}.")
+        cursors[card] = db.get_cursor(key)
+    db.close()
+    return cursors
+
+def sync_card(client: plaid_api.PlaidApi, card: CardType, cursor: str | None, writer: SyncWriter, scheduler: SyncScheduler):
+    print(f"Updating transactions for {card.name}...")
+    for page in get_transaction_pages_from_plaid(client, card, cursor, scheduler):
+        writer.submit(card, page)
+
+def update_db_from_plaid_cards(cards: list[CardType], get_all = False, replace_if_exists = False, jobs = 1):
+    cursors = get_start_cursors(cards, get_all)
+    client = make_plaid_client(pool_size=jobs)
+    scheduler = SyncScheduler()
+    writer = SyncWriter(replace_if_exists=replace_if_exists)
+    writer.start()
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {card: pool.submit(sync_card, client, card, cursors[card], writer, scheduler) for card in cards}
+    writer.finish()
+
+    failed = []
+    for card, future in futures.items():
+        if future.exception() is not None:
+            print(f"Failed to update {card.name}: {future.exception()}")
+            failed.append(card)
+            continue
+        count, skipped, modified, removed = writer.stats.get(card, [0, 0, 0, 0])
+        print(f"Inserted {count} new transactions from {card.name} into DB.")
+        print(f"Skipped {skipped} existing transactions for {card.name}.")
+        print(f"Updated {modified} and removed {removed} transactions for {card.name}.")
+
+    if failed:
+        raise futures[failed[0]].exception()
+
+def update_db_from_plaid(card: CardType, get_all = False, replace_if_exists = False):
+    update_db_from_plaid_cards([card], get_all=get_all, replace_if_exists=replace_if_exists)
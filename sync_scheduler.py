@@ -0,0 +1,130 @@
+import json
+import random
+import threading
+import time
+
+
+MUTATION_DURING_PAGINATION = "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION"
+RETRYABLE_ERROR_CODES = {"RATE_LIMIT_EXCEEDED", "INTERNAL_SERVER_ERROR", "PLANNED_MAINTENANCE"}
+
+
+class SyncMutationError(Exception):
+    # Plaid's data changed mid-pagination; the caller must restart from the cursor it began with
+    pass
+
+
+def plaid_error_code(e: Exception) -> str | None:
+    body = getattr(e, "body", None)
+    if not body:
+        return None
+    try:
+        return json.loads(body).get("error_code")
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+def is_retryable(e: Exception) -> bool:
+    status = getattr(e, "status", None)
+    if isinstance(status, int) and (status == 429 or status >= 500):
+        return True
+    if plaid_error_code(e) in RETRYABLE_ERROR_CODES:
+        return True
+    # Connection resets and timeouts from the HTTP layer
+    return isinstance(e, (ConnectionError, TimeoutError)) or type(e).__module__.startswith("urllib3")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, clock = time.monotonic, sleep = time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            # Take the token now (possibly going negative) so concurrent callers queue up behind us
+            self.tokens -= 1
+        if wait > 0:
+            self.sleep(wait)
+
+
+class SyncScheduler:
+    # Wraps every /transactions/sync call: per-Item rate limiting, retries with
+    # exponential backoff and full jitter, and a page size that follows latency.
+    def __init__(
+        self,
+        rate: float = 0.8,
+        burst: int = 5,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        target_latency: float = 2.0,
+        min_count: int = 100,
+        max_count: int = 500,
+        clock = time.monotonic,
+        sleep = time.sleep,
+        rng: random.Random | None = None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.target_latency = target_latency
+        self.min_count = min_count
+        self.max_count = max_count
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.buckets = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, item: str) -> TokenBucket:
+        with self.lock:
+            if item not in self.buckets:
+                self.buckets[item] = TokenBucket(self.rate, self.burst, clock=self.clock, sleep=self.sleep)
+            return self.buckets[item]
+
+    def page_size(self, item: str) -> int:
+        with self.lock:
+            return self.counts.get(item, self.max_count)
+
+    def observe(self, item: str, latency: float, failed: bool = False):
+        with self.lock:
+            count = self.counts.get(item, self.max_count)
+            if failed or latency > self.target_latency:
+                count = max(self.min_count, count // 2)
+            elif latency < self.target_latency / 2:
+                count = min(self.max_count, int(count * 1.5))
+            self.counts[item] = count
+
+    def backoff(self, attempt: int) -> float:
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, item: str, fn):
+        attempt = 0
+        while True:
+            self.bucket(item).acquire()
+            start = self.clock()
+            try:
+                response = fn()
+            except Exception as e:
+                if plaid_error_code(e) == MUTATION_DURING_PAGINATION:
+                    raise SyncMutationError(str(e)) from e
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                self.observe(item, self.clock() - start, failed=True)
+                delay = self.backoff(attempt)
+                print(f"Plaid request for {item} failed ({plaid_error_code(e) or type(e).__name__}), retrying in {delay:.1f}s")
+                self.sleep(delay)
+                attempt += 1
+                continue
+            self.observe(item, self.clock() - start)
+            return response
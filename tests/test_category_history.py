@@ -0,0 +1,36 @@
+import pytest
+
+from category_history import CategoryHistory
+from mytypes import MyTransaction
+from store import TransactionStore
+
+
+def uber(i: int) -> MyTransaction:
+    return MyTransaction(1_700_000_000 + i, 12.0, "UBER *TRIP", "Uber", None, None, "BILT", f"t{i}", False)
+
+@pytest.fixture
+def db(tmp_path):
+    store = TransactionStore(tmp_path / "ledger.sqlite3")
+    store.build_category_history()
+    yield store
+    store.close()
+
+def test_only_learned_writes_count_as_answers(db):
+    db.upsert_many([uber(i) for i in range(4)])
+    db.set_categories([("t0", "travel")])
+    db.set_categories([("t1", "travel"), ("t2", "travel")], learn=False)
+    assert db.load_category_history().lookup("UBER *TRIP", "Uber") == ("travel", 1, 1)
+
+
+def test_force_always_asks(monkeypatch):
+    import tracker
+
+    history = CategoryHistory({"uber": {"travel": tracker.HISTORY_AUTO_ACCEPT}})
+    monkeypatch.setattr(tracker, "get_idx_category", lambda: {0: "food", 1: "travel"})
+    asked = []
+    monkeypatch.setattr("builtins.input", lambda prompt: asked.append(prompt) or "0")
+
+    assert tracker.categorize_transaction(uber(0), 1, 1, history) == "travel"
+    assert asked == []
+    assert tracker.categorize_transaction(uber(0), 1, 1, history, force=True) == "food"
+    assert len(asked) == 1
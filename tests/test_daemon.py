@@ -0,0 +1,38 @@
+import io
+import sys
+import threading
+
+import pytest
+
+from daemon import TrackerServer, forward
+
+
+@pytest.fixture
+def server(tmp_path):
+    def run_command(argv):
+        print("out:", *argv)
+        print("err:", *argv, file=sys.stderr)
+        if argv and argv[0] == "fail":
+            sys.exit(3)
+
+    path = tmp_path / "tracker.sock"
+    server = TrackerServer(path, run_command)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+def test_forward_keeps_stdout_and_stderr_apart(server):
+    out, err = io.StringIO(), io.StringIO()
+    assert forward(["get", "--limit", "1"], out, err, path=server) == 0
+    assert out.getvalue() == "out: get --limit 1\n"
+    assert err.getvalue() == "err: get --limit 1\n"
+
+def test_forward_returns_the_exit_status(server):
+    out, err = io.StringIO(), io.StringIO()
+    assert forward(["fail"], out, err, path=server) == 3
+    assert out.getvalue() == "out: fail\n"
+
+def test_forward_without_a_daemon(tmp_path):
+    assert forward(["get"], io.StringIO(), io.StringIO(), path=tmp_path / "missing.sock") is None
@@ -0,0 +1,38 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sync = pytest.importorskip("sync", exc_type=ImportError)
+from fake_plaid import FakePlaid, build_parser, make_handler
+from mytypes import CardType
+from sync_scheduler import SyncScheduler
+
+
+@pytest.fixture
+def fake_plaid(monkeypatch):
+    # The real SDK client talks to an in-process fake over HTTP, so every payload
+    # goes through the SDK's own deserialization
+    args = build_parser().parse_args(["--port", "0", "--transactions", "250", "--modified", "20", "--removed", "10"])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(FakePlaid(args)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("PLAID_HOST", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("PLAID_CLIENT_ID", "client")
+    monkeypatch.setenv("PLAID_SECRET", "secret")
+    monkeypatch.setattr(sync, "get_access_token", lambda card: f"access-{card.name}")
+    yield args
+    server.shutdown()
+    server.server_close()
+
+def test_sync_reads_every_page_through_the_sdk(fake_plaid):
+    client = sync.make_plaid_client()
+    pages = [sync.convert_sync_response(response, CardType.BILT) for response in sync.fetch_sync_responses(client, CardType.BILT, None, SyncScheduler(rate=1000, burst=1000))]
+
+    added = [tr for page in pages for tr in page[0]]
+    modified = [tr for page in pages for tr in page[1]]
+    removed = [tid for page in pages for tid in page[2]]
+    assert (len(added), len(modified), len(removed)) == (250, 20, 10)
+    assert not pages[-1][4] and pages[-1][3] == "280"
+    assert len({tr.transaction_id for tr in added}) == 250
+    assert all(tr.account == "BILT" and tr.amount > 0 and tr.name and tr.plaid_category for tr in added)
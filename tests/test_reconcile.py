@@ -0,0 +1,102 @@
+import pytest
+
+from mytypes import MyTransaction
+from reconcile import DEFAULT_EXCLUDED_KINDS, find_duplicates
+from store import TransactionStore
+
+DAY = 86400
+T0 = 1_700_000_000
+
+
+def tr(transaction_id: str, account: str, amount: float, name: str, merchant_name: str | None = None, at: float = T0, category: str | None = "food") -> MyTransaction:
+    return MyTransaction(at, amount, name, merchant_name, None, None, account, transaction_id, False, category)
+
+def pairs(rows: list[MyTransaction], consumed: set[str] = frozenset()) -> set[tuple[str, str, str]]:
+    return set(find_duplicates(rows, rows, set(consumed)))
+
+
+def test_card_charge_funding_venmo_is_a_transfer():
+    charge = tr("c", "CHASEPRIME", 42.5, "VENMO *ALEX 8554665", at=T0)
+    payment = tr("v", "VENMO", 42.5, "Alex dinner", at=T0 + 3600)
+    # The card charge is the one tagged; the Venmo row keeps the detail
+    assert pairs([charge, payment]) == {("c", "v", "transfer")}
+
+def test_same_purchase_on_two_accounts_is_a_duplicate():
+    first = tr("a", "BILT", 19.99, "NETFLIX.COM", "Netflix", at=T0)
+    later = tr("b", "CHASEPRIME", 19.99, "Netflix", "Netflix", at=T0 + DAY)
+    assert pairs([first, later]) == {("b", "a", "duplicate")}
+
+@pytest.mark.parametrize("one, other", [
+    ("Whole Foods", "Whole Earth"),
+    ("American Airlines", "American Express"),
+])
+def test_merchants_sharing_a_first_word_are_not_duplicates(one, other):
+    assert pairs([tr("a", "BILT", 30.0, one, one), tr("b", "CHASEPRIME", 30.0, other, other)]) == set()
+
+def test_no_pair_across_amounts_windows_or_within_one_account():
+    base = tr("a", "BILT", 5.0, "Blue Bottle", "Blue Bottle")
+    assert pairs([base, tr("b", "CHASEPRIME", 5.01, "Blue Bottle", "Blue Bottle")]) == set()
+    assert pairs([base, tr("b", "CHASEPRIME", 5.0, "Blue Bottle", "Blue Bottle", at=T0 + 3 * DAY)]) == set()
+    assert pairs([base, tr("b", "BILT", 5.0, "Blue Bottle", "Blue Bottle", at=T0 + 60)]) == set()
+
+def test_each_row_pairs_at_most_once():
+    rows = [
+        tr("a", "BILT", 12.0, "Uber", "Uber", at=T0),
+        tr("b", "CHASEPRIME", 12.0, "Uber", "Uber", at=T0 + 60),
+        tr("c", "VENMO", 12.0, "Uber", "Uber", at=T0 + 120),
+    ]
+    found = pairs(rows)
+    assert len(found) == 1
+    assert pairs(rows, consumed={"a", "b", "c"}) == set()
+
+
+@pytest.fixture
+def db(tmp_path):
+    store = TransactionStore(tmp_path / "ledger.sqlite3")
+    store.build_rollups()
+    store.build_duplicates()
+    yield store
+    store.close()
+
+def day(ts: float) -> str:
+    from datetime import date
+    return date.fromtimestamp(ts).isoformat()
+
+def summary(db: TransactionStore, accounts: list[str], kinds) -> dict:
+    return db.summary(accounts, day(T0 - DAY), day(T0 + 2 * DAY), kinds)[0]
+
+def test_summaries_only_drop_a_tag_when_its_partner_is_included(db):
+    db.upsert_many([
+        tr("netflix-bilt", "BILT", 19.99, "Netflix", "Netflix", at=T0, category="fun"),
+        tr("netflix-chase", "CHASEPRIME", 19.99, "Netflix", "Netflix", at=T0 + DAY, category="fun"),
+        tr("venmo-charge", "CHASEPRIME", 42.5, "VENMO *ALEX", None, at=T0, category="transfer"),
+        tr("venmo-payment", "VENMO", 42.5, "Alex dinner", None, at=T0 + 60, category="food"),
+        tr("lunch", "BILT", 12.0, "Sweetgreen", "Sweetgreen", at=T0, category="food"),
+    ])
+    assert db.reconcile_duplicates() == {"duplicate": 1, "transfer": 1}
+    everything = ["BILT", "CHASEPRIME", "VENMO"]
+
+    # Transfers are dropped by default, duplicates only when asked
+    assert summary(db, everything, DEFAULT_EXCLUDED_KINDS) == pytest.approx({"fun": 39.98, "food": 54.5})
+    assert summary(db, everything, ["transfer", "duplicate"]) == pytest.approx({"fun": 19.99, "food": 54.5})
+    # A single card never sees both ends, so nothing is dropped from it
+    assert summary(db, ["CHASEPRIME"], ["transfer", "duplicate"]) == pytest.approx({"fun": 19.99, "transfer": 42.5})
+    assert summary(db, ["BILT"], ["transfer", "duplicate"]) == pytest.approx({"fun": 19.99, "food": 12.0})
+
+def test_frame_exclusion_matches_the_rollups(db):
+    pytest.importorskip("numpy")
+    from frame import TransactionFrame
+    from query import Query
+    from store import not_tagged
+
+    db.upsert_many([
+        tr("netflix-bilt", "BILT", 19.99, "Netflix", "Netflix", at=T0, category="fun"),
+        tr("netflix-chase", "CHASEPRIME", 19.99, "Netflix", "Netflix", at=T0 + DAY, category="fun"),
+        tr("venmo-charge", "CHASEPRIME", 42.5, "VENMO *ALEX", None, at=T0, category="transfer"),
+        tr("venmo-payment", "VENMO", 42.5, "Alex dinner", None, at=T0 + 60, category="food"),
+    ])
+    db.reconcile_duplicates()
+    for accounts in (["BILT", "CHASEPRIME", "VENMO"], ["CHASEPRIME"], ["BILT", "CHASEPRIME"]):
+        kinds = ["transfer", "duplicate"]
+        query = Query().for_accounts(accounts).between(T0 - DAY, T0 + 2 * DAY).where(*not_tagged(accounts, kinds))
+        assert TransactionFrame.from_store(db, query).sum_by("my_category") == pytest.approx(summary(db, accounts, kinds))
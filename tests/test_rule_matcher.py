@@ -0,0 +1,72 @@
+import pytest
+
+from guess_categorize import contains_rule, equal_rule, regex_rule
+from rule_matcher import RuleMatcher
+
+
+RULES = {
+    "contains_rules": [
+        {"target": "uber", "category": "Travel"},
+        {"target": "whole foods", "category": "Groceries"},
+        {"target": "eats", "category": "Food"},
+    ],
+    "equal_rules": [
+        {"target": "Netflix", "category": "Entertainment"},
+        {"target": "shell", "category": "Gas"},
+    ],
+    "regex_rules": [
+        {"pattern": r"^amzn mktp", "category": "Shopping"},
+        {"pattern": r"(?P<store>trader joe)'?s", "category": "Groceries"},
+        {"pattern": r"(\d)\1{3}", "category": "Repeats"},
+        {"pattern": r"(?i:DELTA)\s+air", "category": "Flights"},
+        {"pattern": r"(?s)rent.payment", "category": "Rent"},
+        {"pattern": r"venmo.from", "category": "Transfers"},
+        {"pattern": r"coffee$", "category": "Coffee"},
+        {"pattern": r"spotify|netflix", "category": "Subscriptions"},
+    ],
+}
+
+TEXTS = [
+    "UBER *TRIP", "Uber Eats", "UBER\nEATS", "WHOLE FOODS #123", "Netflix", "NETFLIX.COM",
+    "Shell", "SHELL OIL 123", "AMZN Mktp US", "paid AMZN MKTP", "TRADER JOE'S #55", "trader joes",
+    "ACH 1111 DEP", "ACH 1212 DEP", "Delta Air Lines", "DELTA\tAIR", "RENT\nPAYMENT", "RENT PAYMENT",
+    "VENMO FROM ANA", "VENMO\nFROM ANA", "blue bottle coffee", "coffee\n", "coffee shop",
+    "misc\nspotify", "", "nothing to see",
+]
+
+
+def linear(my_rules: dict):
+    # The one-rule-at-a-time loop RuleMatcher replaced
+    makers = {"contains_rules": lambda r: contains_rule(r["target"], r["category"]),
+              "equal_rules": lambda r: equal_rule(r["target"], r["category"]),
+              "regex_rules": lambda r: regex_rule(r["pattern"], r["category"])}
+    rules = [makers[rule_type](rule) for rule_type, rules in my_rules.items() for rule in rules]
+
+    def match(name, merchant_name=None):
+        for rule in rules:
+            for text in (name, merchant_name):
+                if text and (category := rule(text)):
+                    return category
+        return None
+    return match
+
+
+@pytest.mark.parametrize("order", [("contains_rules", "equal_rules", "regex_rules"), ("regex_rules", "equal_rules", "contains_rules")])
+def test_matches_linear_loop(order):
+    rules = {rule_type: RULES[rule_type] for rule_type in order}
+    matcher, expected = RuleMatcher(rules), linear(rules)
+    for name in TEXTS:
+        for merchant_name in (None, "Uber", "Spotify"):
+            assert matcher.match(name, merchant_name) == expected(name, merchant_name), (name, merchant_name)
+
+
+def test_dot_does_not_cross_newlines():
+    matcher = RuleMatcher({"regex_rules": [{"pattern": "venmo.from", "category": "Transfers"}]})
+    assert matcher.separate == []
+    assert matcher.match("VENMO FROM ANA") == "transfers"
+    assert matcher.match("VENMO\nFROM ANA") is None
+
+
+def test_bad_regex_is_a_value_error():
+    with pytest.raises(ValueError, match="Bad regex rule"):
+        RuleMatcher({"regex_rules": [{"pattern": "(unclosed", "category": "x"}]})
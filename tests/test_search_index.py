@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from mytypes import MyTransaction
+from store import TransactionStore
+
+# The search index is kept up to date on every write; after any mix of writes
+# it must match what a full rebuild produces.
+
+NAMES = ["UBER #2975 TRIP", "Starbucks 0412", "7-ELEVEN 1234", "VENMO *ALEX", "Whole Foods Market", None]
+MERCHANTS = ["Uber", "Starbucks", "7-Eleven", "Venmo", "Whole Foods", None]
+CATEGORIES = [None, "food", "travel", "rent"]
+ACCOUNTS = ["BILT", "CHASEPRIME", "VENMO"]
+
+
+def make_transaction(rng: random.Random, i: int) -> MyTransaction:
+    k = rng.randrange(len(NAMES))
+    return MyTransaction(
+        1_700_000_000 + rng.randrange(90 * 86400),
+        round(rng.uniform(-50, 300), 2),
+        NAMES[k],
+        MERCHANTS[k],
+        "FOOD_AND_DRINK",
+        "FOOD_AND_DRINK_COFFEE",
+        rng.choice(ACCOUNTS),
+        f"t{i}",
+        False,
+        rng.choice(CATEGORIES),
+    )
+
+def search_terms(db: TransactionStore) -> list[tuple]:
+    return db.conn.execute("SELECT term, transaction_id FROM search_terms ORDER BY term, transaction_id").fetchall()
+
+def rebuilt(db: TransactionStore) -> list[tuple]:
+    db.set_meta("search_index_built", "")
+    db.build_search_index()
+    return search_terms(db)
+
+
+@pytest.fixture
+def db(tmp_path):
+    store = TransactionStore(tmp_path / "ledger.sqlite3")
+    store.build_search_index()
+    yield store
+    store.close()
+
+def test_incremental_search_terms_match_a_rebuild(db):
+    rng = random.Random(0)
+    rows = [make_transaction(rng, i) for i in range(300)]
+    db.upsert_many(rows[:200])
+    db.insert(rows[200])
+    for tr in rows[201:]:
+        db.apply_sync_page("bilt", [tr], [], [], "c", True)
+
+    # Replacements and Plaid modifications change names, amounts and days
+    for i in range(0, 50, 5):
+        changed = make_transaction(rng, i)
+        db.replace(changed)
+    db.upsert_many([make_transaction(rng, i) for i in range(50, 80)], replace_if_exists=True)
+    modified = [make_transaction(rng, i) for i in range(100, 120)]
+    removed = [f"t{i}" for i in range(120, 140)]
+    db.apply_sync_pages([("bilt", [], modified, removed, "c2", False), ("venmo", [make_transaction(rng, 400)], [], ["t150"], "c3", False)])
+    db.set_categories([(f"t{i}", rng.choice(CATEGORIES)) for i in range(160, 200)])
+
+    incremental = search_terms(db)
+    assert incremental
+    assert incremental == rebuilt(db)
+
+def test_removing_everything_empties_search_terms(db):
+    rng = random.Random(1)
+    rows = [make_transaction(rng, i) for i in range(50)]
+    db.upsert_many(rows)
+    db.apply_sync_page("bilt", [], [], [tr.transaction_id for tr in rows], "c", False)
+    assert search_terms(db) == []
@@ -0,0 +1,196 @@
+import json
+import random
+
+import pytest
+
+from sync_scheduler import MUTATION_DURING_PAGINATION, SyncMutationError, SyncScheduler, TokenBucket
+
+
+class FakeClock:
+    # Time only moves when something sleeps or a fake request takes a while
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class PlaidError(Exception):
+    # Shaped like plaid.ApiException: an HTTP status and a JSON body with error_code
+    def __init__(self, status: int, error_code: str):
+        super().__init__(f"{status} {error_code}")
+        self.status = status
+        self.body = json.dumps({"error_code": error_code})
+
+
+def rate_limited():
+    return PlaidError(429, "RATE_LIMIT_EXCEEDED")
+
+def server_error():
+    return PlaidError(500, "INTERNAL_SERVER_ERROR")
+
+def mutated():
+    return PlaidError(400, MUTATION_DURING_PAGINATION)
+
+
+class FakeSyncClient:
+    # Serves scripted /transactions/sync outcomes in order: an exception is raised,
+    # anything else is returned. Each call can take `latency` seconds of fake time.
+    def __init__(self, clock: FakeClock, script: list, latency: float = 0.0):
+        self.clock = clock
+        self.script = list(script)
+        self.latency = latency
+        self.requests = []
+
+    def transactions_sync(self, request):
+        self.requests.append(request)
+        self.clock.now += self.latency
+        outcome = self.script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_scheduler(clock: FakeClock, **kwargs) -> SyncScheduler:
+    # A roomy bucket so rate limiting stays out of the way unless a test wants it
+    kwargs.setdefault("rate", 1000.0)
+    kwargs.setdefault("burst", 1000)
+    return SyncScheduler(clock=clock.clock, sleep=clock.sleep, rng=random.Random(0), **kwargs)
+
+
+def test_retries_rate_limits_and_server_errors_with_backoff():
+    clock = FakeClock()
+    # 1.5s is inside the steady band for the default 2s target, so only failures resize
+    client = FakeSyncClient(clock, [rate_limited(), server_error(), "page"], latency=1.5)
+    scheduler = make_scheduler(clock, base_delay=0.5, max_count=500, min_count=100)
+
+    assert scheduler.call("BILT", lambda: client.transactions_sync(None)) == "page"
+    assert len(client.requests) == 3
+    # Full jitter: attempt n waits somewhere in [0, base_delay * 2**n]
+    assert len(clock.sleeps) == 2
+    assert 0 <= clock.sleeps[0] <= 0.5
+    assert 0 <= clock.sleeps[1] <= 1.0
+    # Each failure halves the page size
+    assert scheduler.page_size("BILT") == 125
+
+def test_backoff_is_capped():
+    scheduler = make_scheduler(FakeClock(), base_delay=0.5, max_delay=4.0)
+    assert all(scheduler.backoff(10) <= 4.0 for _ in range(100))
+
+def test_gives_up_after_max_retries():
+    clock = FakeClock()
+    client = FakeSyncClient(clock, [server_error() for _ in range(4)])
+    scheduler = make_scheduler(clock, max_retries=3)
+
+    with pytest.raises(PlaidError):
+        scheduler.call("BILT", lambda: client.transactions_sync(None))
+    assert len(client.requests) == 4
+    assert len(clock.sleeps) == 3
+
+def test_client_errors_are_not_retried():
+    clock = FakeClock()
+    client = FakeSyncClient(clock, [PlaidError(400, "INVALID_INPUT")])
+    scheduler = make_scheduler(clock)
+
+    with pytest.raises(PlaidError):
+        scheduler.call("BILT", lambda: client.transactions_sync(None))
+    assert len(client.requests) == 1
+    assert clock.sleeps == []
+
+def test_mutation_during_pagination_is_raised_without_retrying():
+    clock = FakeClock()
+    client = FakeSyncClient(clock, [mutated(), "page"])
+    scheduler = make_scheduler(clock)
+
+    with pytest.raises(SyncMutationError):
+        scheduler.call("BILT", lambda: client.transactions_sync(None))
+    assert len(client.requests) == 1
+    assert clock.sleeps == []
+
+
+def test_token_bucket_waits_once_the_burst_is_spent():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, burst=2, clock=clock.clock, sleep=clock.sleep)
+    for _ in range(4):
+        bucket.acquire()
+    # Two tokens up front, then one per second
+    assert clock.sleeps == [1.0, 1.0]
+
+def test_token_buckets_are_per_item():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, rate=1.0, burst=1)
+    scheduler.call("BILT", lambda: "page")
+    scheduler.call("VENMO", lambda: "page")
+    assert clock.sleeps == []
+    scheduler.call("BILT", lambda: "page")
+    assert clock.sleeps == [1.0]
+
+
+def test_page_size_shrinks_when_slow_and_grows_when_fast():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, target_latency=2.0, min_count=100, max_count=500)
+
+    slow = FakeSyncClient(clock, ["page"] * 3, latency=3.0)
+    for expected in (250, 125, 100):
+        scheduler.call("BILT", lambda: slow.transactions_sync(None))
+        assert scheduler.page_size("BILT") == expected
+
+    fast = FakeSyncClient(clock, ["page"] * 4, latency=0.1)
+    for expected in (150, 225, 337, 500):
+        scheduler.call("BILT", lambda: fast.transactions_sync(None))
+        assert scheduler.page_size("BILT") == expected
+
+    # In between the target and half of it, the size holds
+    steady = FakeSyncClient(clock, ["page"], latency=1.5)
+    scheduler.call("BILT", lambda: steady.transactions_sync(None))
+    assert scheduler.page_size("BILT") == 500
+
+
+# fetch_sync_responses drives the scheduler with real TransactionsSyncRequests
+sync = pytest.importorskip("sync", exc_type=ImportError)
+from mytypes import CardType
+
+
+def sync_page(next_cursor: str, has_more: bool) -> dict:
+    return {"added": [], "modified": [], "removed": [], "next_cursor": next_cursor, "has_more": has_more}
+
+@pytest.fixture
+def access_token(monkeypatch):
+    monkeypatch.setattr(sync, "get_access_token", lambda card: "access-token")
+
+def test_mutation_restarts_pagination_from_the_original_cursor(access_token):
+    clock = FakeClock()
+    client = FakeSyncClient(clock, [
+        sync_page("c1", True),
+        mutated(),
+        sync_page("c1", True),
+        sync_page("c2", False),
+    ])
+    scheduler = make_scheduler(clock)
+
+    pages = list(sync.fetch_sync_responses(client, CardType.BILT, "c0", scheduler))
+    assert [page["next_cursor"] for page in pages] == ["c1", "c1", "c2"]
+    assert [request.get("cursor") for request in client.requests] == ["c0", "c1", "c0", "c1"]
+
+def test_mutation_restarts_are_bounded(access_token):
+    clock = FakeClock()
+    client = FakeSyncClient(clock, [mutated() for _ in range(sync.MAX_PAGINATION_RESTARTS + 1)])
+    scheduler = make_scheduler(clock)
+
+    with pytest.raises(SyncMutationError):
+        list(sync.fetch_sync_responses(client, CardType.BILT, None, scheduler))
+    assert len(client.requests) == sync.MAX_PAGINATION_RESTARTS + 1
+
+def test_requests_use_the_adapted_page_size(access_token):
+    clock = FakeClock()
+    client = FakeSyncClient(clock, [server_error(), sync_page("c1", True), sync_page("c2", False)], latency=1.5)
+    scheduler = make_scheduler(clock, min_count=100, max_count=500)
+
+    list(sync.fetch_sync_responses(client, CardType.BILT, None, scheduler))
+    # The retry reuses the request built before the failure; the next page asks for less
+    assert [request.count for request in client.requests] == [500, 500, 250]
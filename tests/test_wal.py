@@ -0,0 +1,20 @@
+from mytypes import MyTransaction
+from store import TransactionStore
+
+
+def make_batch(start: int, size: int) -> list[MyTransaction]:
+    return [
+        MyTransaction(1_700_000_000 + i * 60, 10.0 + i % 97, f"Merchant {i % 500} #{i}", f"Merchant {i % 500}", "FOOD_AND_DRINK", "FOOD_AND_DRINK_COFFEE", "BILT", f"t{i}", False)
+        for i in range(start, start + size)
+    ]
+
+def test_bulk_load_keeps_the_wal_bounded(tmp_path):
+    compact_bytes = 64 * 1024
+    db = TransactionStore(tmp_path / "ledger.sqlite3", compact_bytes=compact_bytes)
+    peak = 0
+    for start in range(0, 40_000, 200):
+        db.upsert_many(make_batch(start, 200))
+        peak = max(peak, db.wal_size())
+    db.close()
+    # The cap plus at most one commit's worth of log
+    assert peak < 4 * compact_bytes + 1024 * 1024
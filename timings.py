@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+# Wall time and call counts per named phase, collected only while `--timings` is on.
+# Phases nest, so an outer phase's time includes its inner ones.
+enabled = False
+_phases = {}
+_lock = threading.Lock()
+
+
+def enable():
+    global enabled
+    enabled = True
+    reset()
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    with _lock:
+        _phases.clear()
+
+
+def record(name: str, seconds: float, calls: int = 1):
+    with _lock:
+        stats = _phases.setdefault(name, [0, 0.0])
+        stats[0] += calls
+        stats[1] += seconds
+
+@contextmanager
+def phase(name: str):
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def timed(name: str):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def snapshot() -> dict[str, tuple[int, float]]:
+    with _lock:
+        return {name: (calls, seconds) for name, (calls, seconds) in _phases.items()}
+
+def format_text(command: str | None = None) -> str:
+    phases = snapshot()
+    lines = [f"{'phase':<32} {'calls':>8} {'total ms':>12} {'per call ms':>12}"]
+    for name, (calls, seconds) in sorted(phases.items(), key=lambda kv: kv[1][1], reverse=True):
+        per_call = seconds / calls * 1000 if calls else 0.0
+        lines.append(f"{name:<32} {calls:>8} {seconds * 1000:>12.2f} {per_call:>12.3f}")
+    if command:
+        lines.insert(0, f"Timings for `{command}`:")
+    return "\n".join(lines) + "\n"
+
+def format_json(command: str | None = None) -> str:
+    phases = {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in snapshot().items()}
+    return json.dumps({"command": command, "time": time.time(), "phases": phases}, indent=2) + "\n"
+
+def format_prometheus(command: str | None = None) -> str:
+    # Text exposition format, e.g. for node_exporter's textfile collector
+    label = f'command="{command or ""}"'
+    lines = [
+        "# HELP tracker_phase_seconds_total Wall time spent in each phase of a tracker command.",
+        "# TYPE tracker_phase_seconds_total counter",
+    ]
+    phases = sorted(snapshot().items())
+    for name, (_, seconds) in phases:
+        lines.append(f'tracker_phase_seconds_total{{{label},phase="{name}"}} {seconds:.6f}')
+    lines += [
+        "# HELP tracker_phase_calls_total Calls into each phase of a tracker command.",
+        "# TYPE tracker_phase_calls_total counter",
+    ]
+    for name, (calls, _) in phases:
+        lines.append(f'tracker_phase_calls_total{{{label},phase="{name}"}} {calls}')
+    return "\n".join(lines) + "\n"
+
+FORMATS = {"text": format_text, "json": format_json, "prometheus": format_prometheus}
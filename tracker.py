@@ -1,16 +1,19 @@
 #!/usr/bin/env python3
+# Keep imports here cheap: get/summary should start without loading the Plaid SDK,
+# numpy or the rule matcher. Heavier modules are imported inside the commands that use them.
 import argparse
-from plaid.api import plaid_api
 import os
-from plaid.model.transactions_sync_request import TransactionsSyncRequest
-from dotenv import load_dotenv
-load_dotenv()
+import sys
 from datetime import date, timedelta
-from dataclasses import asdict
+from functools import lru_cache
 from utils import *
 from argparse import RawTextHelpFormatter
-from guess_categorize import guess_category
+from guess_categorize import guess_category, get_rules, get_matcher
+from category_history import CategoryHistory, normalize_merchant
+import timings
+from timings import phase
 import json
+import time
 
 
 MY_CARDS_VALS = [CardType.CHASEPRIME.value, CardType.BILT.value, CardType.VENMO.value]
@@ -21,17 +24,29 @@ CARD_TYPE_MAP = {
     CardType.VENMO.value: CardType.VENMO,
 }
 
-with open("./db/categories.json", "r") as file:
-    categories = json.load(file)
+CATEGORIES_PATH = base / "db" / "categories.json"
+# Commands handed to a running `serve` daemon; interactive categorize and update stay in-process
+DAEMON_COMMANDS = {"get", "summary", "search"}
 
-# print(categories)
+AUTO_PARALLEL_MIN_BATCH = 4000
+# Skip the prompt once a merchant has had the same answer this many times in a row
+HISTORY_AUTO_ACCEPT = 3
 
-idx_category = {i:cat for i, cat in enumerate(categories)}
-category_idx = {cat:i for i, cat in enumerate(categories)}
+@lru_cache(maxsize=None)
+def get_idx_category() -> dict[int, str]:
+    with open(CATEGORIES_PATH, "r") as file:
+        categories = json.load(file)
+    return {i:cat for i, cat in enumerate(categories)}
 
 
 
 
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {value}")
+    return number
+
 def get_dates_from_args(args) -> tuple[date, date]:
 
     if args.from_to_date:
@@ -66,57 +81,116 @@ def get_dates_from_args(args) -> tuple[date, date]:
     
 
 def do_update(args):
+    from sync import update_db_from_plaid_cards
+
     print(args)
-    db = TinyDB(DB_PATH)
     if args.filter_by:
         cards_to_do = [CARD_TYPE_MAP[args.filter_by]]
     else:
         cards_to_do = list(CardType)
 
-    for card in cards_to_do:
-        print(f"Updating transactions for {card.name}...")
-        update_db_from_plaid(card, get_all=args.get_all, replace_if_exists=args.force)
-
-    db.close()
+    update_db_from_plaid_cards(cards_to_do, get_all=args.get_all, replace_if_exists=args.force, jobs=args.jobs)
+    # Only rows this sync inserted or changed are waiting to be paired
+    tagged = reconcile_duplicates()
+    if tagged:
+        print(f"Tagged {', '.join(f'{n} {kind}s' for kind, n in sorted(tagged.items()))} across accounts.")
+
+
+def print_transaction(timestamp: float, amount: float, my_category: str | None, name: str):
+    print_time = datetime.fromtimestamp(timestamp).isoformat()
+    print_amt = f"{amount:<10.2f}"
+    print_my_category = f"{my_category:<20}" if my_category else " " * 20
+    print_name = f"{name:<60}"
+    print(print_time, print_my_category, print_amt, print_name)
+
+# Fields emitted by `get --format jsonl|csv`; the first four are what the text view prints
+GET_FIELDS = ("datetime", "amount", "my_category", "name", "merchant_name", "account", "plaid_category", "plaid_subcategory", "transaction_id", "is_categorized")
+
+def render_rows(rows, fields, fmt: str):
+    # rows are tuples in `fields` order, written as they arrive
+    out = sys.stdout
+    if fmt == "jsonl":
+        for row in rows:
+            out.write(json.dumps(dict(zip(fields, row))) + "\n")
+    elif fmt == "csv":
+        import csv
+        writer = csv.writer(out)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(row)
+    else:
+        for row in rows:
+            print_transaction(*row[:4])
 
 def do_get(args):
+    from itertools import islice
+    from operator import attrgetter
+
     if args.filter_by:
         cards_to_do = [CARD_TYPE_MAP[args.filter_by]]
     else:
         cards_to_do = list(CardType)
-
+    text = args.format == "text"
+    stop = None if args.limit is None else args.offset + args.limit
 
     (start_date, end_date) = get_dates_from_args(args)
-    print(f"Getting transactions from {start_date} to {end_date} for cards: {[c.name for c in cards_to_do]}")
-
-    all_transactions = []
-    for card in cards_to_do:
-        all_transactions.extend(get_transactions_between_dates(start_date, end_date, card))
-
-    print(f"Found {len(all_transactions)} transactions.")
-
-    all_transactions.sort(key=lambda x: x.datetime, reverse=True)
-
-    
-    for tr in all_transactions:
-        if args.category and tr.my_category != args.category:
-            continue
-
-        print_time = datetime.fromtimestamp(tr.datetime).isoformat()
-        print_amt = f"{tr.amount:<10.2f}"
-        print_my_category = f"{tr.my_category:<20}" if tr.my_category else " " * 20
-        print_name = f"{tr.name:<60}"
-        print(print_time, print_my_category, print_amt, print_name)
-
-def categorize_transaction(tr: MyTransaction, cur, total) -> str:
+    if text:
+        print(f"Getting transactions from {start_date} to {end_date} for cards: {[c.name for c in cards_to_do]}")
+
+    query = query_between_dates(start_date, end_date, cards_to_do).in_category(args.category).amount_between(args.min_amount, args.max_amount)
+    if args.merchant:
+        query.merchant(args.merchant)
+
+    # The frame only carries the columns the text view prints, so jsonl/csv always
+    # take a row path below and every format has the same schema on every path
+    if args.columnar and text:
+        frame = get_frame(query)
+        print(f"Found {len(frame)} transactions.")
+        with phase("get.render"):
+            render_rows(islice(frame.sort_by_datetime(reverse=True).rows(), args.offset, stop), GET_FIELDS[:4], args.format)
+        return
+
+    fields = attrgetter(*GET_FIELDS)
+    if not args.no_snapshot:
+        # Rows come out of the mmap'd snapshot already time-ordered and are walked
+        # newest first until the page is full; the category is checked on its string
+        # column and only rows that are printed get decoded
+        with load_snapshot() as snap:
+            if text:
+                print(f"Found {snap.count(query)} transactions.")
+            with phase("get.render"):
+                render_rows((fields(snap.row(i)) for i in islice(snap.select(query, reverse=True), args.offset, stop)), GET_FIELDS, args.format)
+        return
+
+    if text:
+        print(f"Found {count_transactions(query)} transactions.")
+    with phase("get.render"):
+        render_rows(map(fields, iter_transactions(query, newest_first=True, offset=args.offset, limit=args.limit)), GET_FIELDS, args.format)
+
+def learned_category(history: CategoryHistory | None, tr: MyTransaction) -> str | None:
+    learned = history.lookup(tr.name, tr.merchant_name) if history is not None else None
+    if learned and learned[1] == learned[2] and learned[1] >= HISTORY_AUTO_ACCEPT:
+        return learned[0]
+    return None
+
+def categorize_transaction(tr: MyTransaction, cur, total, history: CategoryHistory | None = None, force: bool = False) -> str:
 
     print("--------------------------------")
     print(f"Categorizing transaction {cur}/{total}:")
     print(datetime.fromtimestamp(tr.datetime).isoformat(), tr.amount, tr.name, tr.merchant_name)
-    guessed_category = guess_category(tr.name, tr.merchant_name)
+
+    # --force is for correcting past answers, so it always asks
+    confident = None if force else learned_category(history, tr)
+    if confident:
+        print(f"Using learned category: {confident}")
+        return confident
+
+    learned = history.lookup(tr.name, tr.merchant_name) if history is not None else None
+    guessed_category = learned[0] if learned else guess_category(tr.name, tr.merchant_name)
     print(f"Guessed category: {guessed_category}")
 
     print("Available categories:")
+    idx_category = get_idx_category()
     for k,v in idx_category.items():
         print(f"{k}: {v}")
     
@@ -145,38 +219,136 @@ def categorize_transaction(tr: MyTransaction, cur, total) -> str:
             return "Uncategorized"
 
 
+def auto_categorize(db: TransactionStore, args, cards_to_do: list[CardType], history: CategoryHistory) -> list[MyTransaction]:
+    # Without an explicit date option, --auto covers the whole ledger
+    query = Query().for_accounts([c.name for c in cards_to_do]).only_uncategorized()
+    if args.from_to_date or args.this_month or args.last_month or args.last_week:
+        query.between(*get_timestamps_between_dates(*get_dates_from_args(args)))
+
+    from rule_matcher import make_match_pool, match_many
+
+    start = time.perf_counter()
+    matched = []
+    unmatched = []
+    pool = None
+    try:
+        for batch in db.select_batches(query):
+            if pool is None and args.jobs > 1 and len(batch) >= AUTO_PARALLEL_MIN_BATCH:
+                pool = make_match_pool(get_rules(), args.jobs)
+            to_match = []
+            for tr in batch:
+                confident = learned_category(history, tr)
+                if confident:
+                    matched.append((tr.transaction_id, confident))
+                else:
+                    to_match.append(tr)
+            guesses = match_many(get_matcher(), [(tr.name, tr.merchant_name) for tr in to_match], pool)
+            for tr, guessed_category in zip(to_match, guesses):
+                if guessed_category:
+                    matched.append((tr.transaction_id, guessed_category))
+                else:
+                    unmatched.append(tr)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Rule and history guesses aren't the user's answers, so they don't feed the history
+    db.set_categories(matched, learn=False)
+    elapsed = time.perf_counter() - start
+    total = len(matched) + len(unmatched)
+    print(f"Auto-categorized {len(matched)} of {total} transactions in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} rows/s).")
+    return unmatched
+
 def do_categorize(args):
     print(args)
-    db = TinyDB(DB_PATH)
+    db = open_store()
 
     if args.filter_by:
         cards_to_do = [CARD_TYPE_MAP[args.filter_by]]
     else:
         cards_to_do = list(CardType)
-    
-    (start_date, end_date) = get_dates_from_args(args)
-    
-    force_categorize = args.force
-    if force_categorize:
-        print("Force categorization enabled: will categorize all transactions in the date range, even if already categorized.")
 
-    all_transactions = []
-    for card in cards_to_do:
-        all_transactions.extend(get_transactions_between_dates(start_date, end_date, card, get_only_uncategorized=not force_categorize))
-    
-    all_transactions.sort(key=lambda x: x.datetime, reverse=True)
-    print(f"Found {len(all_transactions)} transactions to categorize.")
+    history = db.load_category_history()
 
-    for i in range(len(all_transactions)):
-        tr = all_transactions[i]
-        new_category = categorize_transaction(tr, i+1, len(all_transactions))
-        print(f"Selected category: {new_category}")
+    if args.auto:
+        with phase("categorize.auto"):
+            all_transactions = auto_categorize(db, args, cards_to_do, history)
+    else:
+        (start_date, end_date) = get_dates_from_args(args)
+
+        force_categorize = args.force
+        if force_categorize:
+            print("Force categorization enabled: will categorize all transactions in the date range, even if already categorized.")
+
+        all_transactions = query_transactions(query_between_dates(start_date, end_date, cards_to_do).only_uncategorized(not force_categorize))
 
-        if new_category != "Uncategorized":
-            tr.my_category = new_category
-            Transaction = Query()
-            db.update(asdict(tr), Transaction.transaction_id == tr.transaction_id)
+    all_transactions.sort(key=lambda x: x.datetime, reverse=True)
+    print(f"Found {len(all_transactions)} transactions to categorize.")
 
+    buffer = CategoryWriteBuffer(db, flush_every=args.flush_every, flush_seconds=args.flush_seconds)
+    try:
+        for i in range(len(all_transactions)):
+            tr = all_transactions[i]
+            new_category = categorize_transaction(tr, i+1, len(all_transactions), history, force=args.force)
+            print(f"Selected category: {new_category}")
+
+            if new_category != "Uncategorized":
+                history.record(normalize_merchant(tr.name, tr.merchant_name), tr.my_category, new_category)
+                tr.my_category = new_category
+                buffer.add(tr.transaction_id, new_category)
+    except (KeyboardInterrupt, EOFError):
+        print("\nStopping categorization.")
+    finally:
+        buffer.close()
+        print(f"Saved {buffer.written} categorized transactions.")
+        db.close()
+
+
+def do_search(args):
+    from operator import attrgetter
+
+    cards_to_do = [CARD_TYPE_MAP[args.filter_by]] if args.filter_by else list(CardType)
+    query = Query().for_accounts([c.name for c in cards_to_do]).in_category(args.category)
+    # Without an explicit date option, search covers the whole ledger
+    if args.from_to_date or args.this_month or args.last_month or args.last_week:
+        query.between(*get_timestamps_between_dates(*get_dates_from_args(args)))
+
+    found = search_transactions(args.terms, query, prefix=not args.exact, limit=args.limit)
+    if args.format == "text":
+        print(f"Found {len(found)} transactions matching {' '.join(args.terms)!r}.")
+    with phase("search.render"):
+        render_rows(map(attrgetter(*GET_FIELDS), found), GET_FIELDS, args.format)
+
+
+def excluded_kinds(args) -> list[str]:
+    kinds = [kind for kind in DEFAULT_EXCLUDED_KINDS if not args.include_transfers]
+    if args.exclude_duplicates:
+        kinds.append("duplicate")
+    return kinds
+
+def summarize_trend(args, start_date: date, end_date: date, cards_to_do: list[CardType]):
+    import numpy as np
+    from frame import CumulativeSums
+
+    # The first rows' windows reach back before start_date, so those buckets are loaded too and dropped after summing
+    lead = previous_bucket_starts(start_date, args.group_by, args.rolling - 1)
+    frame = get_frame_between_dates(lead[0] if lead else start_date, end_date, cards_to_do, excluded_kinds(args))
+    starts = bucket_starts(start_date, end_date, args.group_by)
+    edges = np.array([get_timestamps_between_dates(d, d)[0] for d in lead + starts] + [get_timestamps_between_dates(end_date, end_date)[1] + 1])
+    with phase("summary.cumsum"):
+        totals = CumulativeSums(frame).buckets(edges, rolling=args.rolling)
+    totals = {c: t[len(lead):] for c, t in totals.items()}
+
+    print(f"Found {int((frame.datetime >= edges[len(lead)]).sum())} transactions.")
+    if args.rolling > 1:
+        print(f"Each row totals the {args.rolling} {args.group_by}s ending with it.")
+    categories = sorted(totals, key=lambda c: -abs(totals[c].sum()))
+    label = {"day": "%Y-%m-%d", "week": "%Y-%m-%d", "month": "%Y-%m"}[args.group_by]
+    with phase("summary.render"):
+        print(f"{args.group_by:<12}" + "".join(f"{str(c)[:11]:>12}" for c in categories) + f"{'total':>12}")
+        for i, start in enumerate(starts):
+            row = [totals[c][i] for c in categories]
+            print(f"{start.strftime(label):<12}" + "".join(f"{v:>12.2f}" for v in row) + f"{sum(row):>12.2f}")
 
 def do_summary(args):
     if args.filter_by:
@@ -185,40 +357,84 @@ def do_summary(args):
         cards_to_do = list(CardType)
 
 
+    if args.rolling < 1:
+        print("Error: --rolling must be at least 1.")
+        exit(1)
+    if args.rolling != 1 and not args.group_by:
+        print("Error: --rolling needs --group-by.")
+        exit(1)
+
     (start_date, end_date) = get_dates_from_args(args)
     # print(f"Summarizing transactions from {start_date} to {end_date} for cards: {[c.name for c in cards_to_do]}")
 
-    all_transactions = []
-    for card in cards_to_do:
-        all_transactions.extend(get_transactions_between_dates(start_date, end_date, card))
+    if args.group_by:
+        summarize_trend(args, start_date, end_date, cards_to_do)
+        return
 
-    print(f"Found {len(all_transactions)} transactions.")
+    exclude_kinds = excluded_kinds(args)
+    if args.columnar:
+        frame = get_frame_between_dates(start_date, end_date, cards_to_do, exclude_kinds)
+        with phase("frame.sum_by"):
+            totals, count = frame.sum_by("my_category"), len(frame)
+    else:
+        totals, count = get_summary_between_dates(start_date, end_date, cards_to_do, exclude_kinds)
 
-    # all_transactions.sort(key=lambda x: x.datetime, reverse=True)
+    print(f"Found {count} transactions.")
 
-    
-    # for tr in all_transactions:
-    #     print_time = datetime.fromtimestamp(tr.datetime).isoformat()
-    #     print_amt = f"{tr.amount:<10.2f}"
-    #     print_my_category = f"{tr.my_category:<20}" if tr.my_category else " " * 20
-    #     print_name = f"{tr.name:<60}"
-    #     print(print_time, print_my_category, print_amt, print_name)
-
-    totals = {}
-    for tr in all_transactions:
-        if tr.my_category not in totals:
-            totals[tr.my_category] = 0
-        totals[tr.my_category] += tr.amount
-
-    # f"{tr.my_category:<20}"
-    
-    for category, total in totals.items():
-        print(f"{category:<20} {total:<10.2f}")
+    with phase("summary.render"):
+        for category, total in totals.items():
+            print(f"{str(category):<20} {total:<10.2f}")
 
 
-def main():
+def do_reconcile(args):
+    tagged = reconcile_duplicates(rebuild=args.rebuild, window_days=args.window_days)
+    print(f"Tagged {tagged.get('duplicate', 0)} duplicates and {tagged.get('transfer', 0)} transfers.")
+    if not args.show:
+        return
+
+    cards_to_do = [CARD_TYPE_MAP[args.filter_by]] if args.filter_by else list(CardType)
+    query = Query().for_accounts([c.name for c in cards_to_do])
+    if args.from_to_date or args.this_month or args.last_month or args.last_week:
+        query.between(*get_timestamps_between_dates(*get_dates_from_args(args)))
+    for kind, tr, kept in get_duplicate_pairs(query):
+        print(f"{kind:<10} {date.fromtimestamp(tr.datetime)} {tr.amount:>10.2f} {tr.account:<11} {tr.name[:40]:<40} -> {kept.account:<11} {kept.name[:40]}")
+
+
+def do_compact(args):
+    db = open_store()
+    before = db.pending_wal_bytes()
+    frames = db.compact(vacuum=args.vacuum)
+    print(f"Folded {frames} WAL frames ({before / 1024:.0f} KiB) into {DB_PATH.name}.")
+    db.close()
+
+
+def do_serve(args):
+    from daemon import serve
+
+    def warm_up():
+        keep_store_resident()
+        for load in (get_matcher, get_idx_category):
+            try:
+                load()
+            except FileNotFoundError as e:
+                print(f"Not preloading {e.filename}: file not found")
+
+    def run_update():
+        run(["update", "--jobs", str(len(CardType))])
+
+    serve(run_forwarded, warm_up, update_every=args.update_every, run_update=run_update)
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="My CLI tool", formatter_class=RawTextHelpFormatter)
     # parser.add_argument('--filter-by', type=str, help='filter cards', choices=MY_CARDS_VALS)
+    parser.add_argument("--direct", action="store_true", default=False, help="Don't hand get/summary/search to a running `serve` daemon")
+    parser.add_argument("--timings", action="store_true", default=False, help="Report wall time and call counts per phase on stderr")
+    parser.add_argument("--timings-format", choices=sorted(timings.FORMATS), default="text", help="Format for --timings output")
+    parser.add_argument("--timings-out", type=str, help="Write timings to this file instead of stderr (implies --timings)")
+    parser.add_argument("--profile", action="store_true", default=False, help="Run under cProfile and print the top functions on stderr (main thread only)")
+    parser.add_argument("--profile-out", type=str, help="Dump pstats data here instead of printing it (implies --profile)")
+    parser.add_argument("--profile-sort", default="cumulative", help="pstats sort key for --profile output")
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
@@ -226,6 +442,7 @@ def main():
     parser_update.add_argument("--get-all", help="Update all transactions from beginning", action="store_true")
     parser_update.add_argument("--force", help="Replace existing transactions in DB", action="store_true")
     parser_update.add_argument('--filter-by', type=str, help='filter cards', choices=MY_CARDS_VALS)
+    parser_update.add_argument("--jobs", type=int, default=1, help="Number of cards to sync concurrently")
     parser_update.set_defaults(func=do_update)
 
 
@@ -234,6 +451,14 @@ def main():
     parser_get.add_argument("--hide-goals", action="store_true", help="Hide goals")
     parser_get.add_argument('--filter-by', type=str, help='filter cards', choices=MY_CARDS_VALS)
     parser_get.add_argument("--show-transactions", action="store_true", default=False, help="Show individual transactions")
+    parser_get.add_argument("--no-snapshot", action="store_true", default=False, help="Query the SQLite store instead of the mmap'd snapshot")
+    parser_get.add_argument("--columnar", action="store_true", default=False, help="Load the range into a NumPy frame for the text view (needs numpy)")
+    parser_get.add_argument("--format", choices=["text", "jsonl", "csv"], default="text", help="Output format; jsonl and csv stream rows without the text headers")
+    parser_get.add_argument("--limit", type=non_negative_int, help="Print at most this many transactions (newest first)")
+    parser_get.add_argument("--offset", type=non_negative_int, default=0, help="Skip this many of the newest matching transactions")
+    parser_get.add_argument("--min-amount", type=float, help="Only transactions of at least this amount")
+    parser_get.add_argument("--max-amount", type=float, help="Only transactions of at most this amount")
+    parser_get.add_argument("--merchant", type=str, help="Only transactions from this merchant (case-insensitive)")
 
 
     date_group = parser_get.add_mutually_exclusive_group()
@@ -249,6 +474,10 @@ def main():
     parser_categorize = subparsers.add_parser("categorize", help="Categorize transactions")
     parser_categorize.add_argument("--force", action="store_true", default=False, help="Force categorize transactions even if already categorized")
     parser_categorize.add_argument('--filter-by', type=str, help='filter cards', choices=MY_CARDS_VALS)
+    parser_categorize.add_argument("--auto", action="store_true", default=False, help="Apply rule guesses to all uncategorized transactions, then prompt only for the rest")
+    parser_categorize.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes for --auto rule evaluation")
+    parser_categorize.add_argument("--flush-every", type=int, default=20, help="Write answers to the DB after this many categorizations")
+    parser_categorize.add_argument("--flush-seconds", type=float, default=30.0, help="Write pending answers to the DB after this many seconds")
 
     date_group_2 = parser_categorize.add_mutually_exclusive_group()
     date_group_2.add_argument("--from-to-date", nargs=2, help="Date range (FROM TO), e.g. 2025-09-01 2025-09-15")
@@ -260,6 +489,11 @@ def main():
 
     parser_summary = subparsers.add_parser("summary", help="Summarize transactions")
     parser_summary.add_argument('--filter-by', type=str, help='filter cards', choices=MY_CARDS_VALS)
+    parser_summary.add_argument("--columnar", action="store_true", default=False, help="Aggregate from a NumPy frame instead of the rollups (needs numpy)")
+    parser_summary.add_argument("--group-by", choices=["day", "week", "month"], help="Print a per-category trend table with one row per bucket (needs numpy)")
+    parser_summary.add_argument("--rolling", type=int, default=1, help="With --group-by, total each row over the last N buckets")
+    parser_summary.add_argument("--include-transfers", action="store_true", default=False, help="Count both ends of transfers between your accounts (e.g. a card charge that funded Venmo)")
+    parser_summary.add_argument("--exclude-duplicates", action="store_true", default=False, help="Also drop rows tagged as the same purchase posted on two accounts")
 
     date_group_3 = parser_summary.add_mutually_exclusive_group()
     date_group_3.add_argument("--from-to-date", nargs=2, help="Date range (FROM TO), e.g. 2025-09-01 2025-09-15")
@@ -269,8 +503,113 @@ def main():
 
     parser_summary.set_defaults(func=do_summary)
 
-    args = parser.parse_args()
-    args.func(args)
+    parser_search = subparsers.add_parser("search", help="Find transactions by words in their name or merchant")
+    parser_search.add_argument("terms", nargs="+", help="Words to match; every word must match, as a prefix unless --exact")
+    parser_search.add_argument("--exact", action="store_true", default=False, help="Match whole words only")
+    parser_search.add_argument("--category", type=str, help="Filter by category")
+    parser_search.add_argument('--filter-by', type=str, help='filter cards', choices=MY_CARDS_VALS)
+    parser_search.add_argument("--limit", type=non_negative_int, help="Show at most this many transactions (newest first)")
+    parser_search.add_argument("--format", choices=["text", "jsonl", "csv"], default="text", help="Output format")
+
+    date_group_4 = parser_search.add_mutually_exclusive_group()
+    date_group_4.add_argument("--from-to-date", nargs=2, help="Date range (FROM TO), e.g. 2025-09-01 2025-09-15")
+    date_group_4.add_argument("--this-month", action="store_true", default=False, help="Shows from beg of month to today")
+    date_group_4.add_argument("--last-month", action="store_true", default=False, help="Shows from exactly a month ago")
+    date_group_4.add_argument("--last-week", action="store_true", default=False, help="Show from exactly a week ago")
+
+    parser_search.set_defaults(func=do_search)
+
+    parser_reconcile = subparsers.add_parser("reconcile", help="Tag cross-account transfers (skipped by summary) and duplicates (skipped with --exclude-duplicates)")
+    parser_reconcile.add_argument("--rebuild", action="store_true", default=False, help="Drop all tags and pair the whole ledger again")
+    parser_reconcile.add_argument("--window-days", type=float, default=DEFAULT_WINDOW_DAYS, help="How far apart two postings can be and still pair up")
+    parser_reconcile.add_argument("--show", action="store_true", default=False, help="List the tagged pairs")
+    parser_reconcile.add_argument('--filter-by', type=str, help='filter cards', choices=MY_CARDS_VALS)
+
+    date_group_5 = parser_reconcile.add_mutually_exclusive_group()
+    date_group_5.add_argument("--from-to-date", nargs=2, help="Date range (FROM TO), e.g. 2025-09-01 2025-09-15")
+    date_group_5.add_argument("--this-month", action="store_true", default=False, help="Shows from beg of month to today")
+    date_group_5.add_argument("--last-month", action="store_true", default=False, help="Shows from exactly a month ago")
+    date_group_5.add_argument("--last-week", action="store_true", default=False, help="Show from exactly a week ago")
+
+    parser_reconcile.set_defaults(func=do_reconcile)
+
+    parser_compact = subparsers.add_parser("compact", help="Fold the write-ahead log into the DB file")
+    parser_compact.add_argument("--vacuum", action="store_true", default=False, help="Also rebuild the DB file to reclaim free pages")
+    parser_compact.set_defaults(func=do_compact)
+
+    parser_serve = subparsers.add_parser("serve", help="Keep the ledger loaded and answer get/summary/search over a local socket")
+    parser_serve.add_argument("--update-every", type=float, default=None, help="Also run `update` every N minutes")
+    parser_serve.set_defaults(func=do_serve)
+
+    return parser
+
+def write_timings(args):
+    report = timings.FORMATS[args.timings_format](args.command)
+    if args.timings_out:
+        # Written whole and then renamed, so a cron scraper never sees half a file
+        tmp = f"{args.timings_out}.tmp"
+        with open(tmp, "w") as f:
+            f.write(report)
+        os.replace(tmp, args.timings_out)
+    else:
+        sys.stderr.write(report)
+
+def write_profile(profiler, args):
+    import pstats
+
+    if args.profile_out:
+        profiler.dump_stats(args.profile_out)
+        print(f"Wrote profile to {args.profile_out}", file=sys.stderr)
+        return
+    pstats.Stats(profiler, stream=sys.stderr).strip_dirs().sort_stats(args.profile_sort).print_stats(30)
+
+def execute(args):
+    if args.timings or args.timings_out:
+        timings.enable()
+    profiler = None
+    if args.profile or args.profile_out:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with phase(f"command.{args.command}"):
+            args.func(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            write_profile(profiler, args)
+        if timings.enabled:
+            write_timings(args)
+            timings.disable()
+
+def run(argv: list[str]):
+    args = build_parser().parse_args(argv)
+    execute(args)
+
+def run_forwarded(argv: list[str]):
+    # What the daemon runs for a client. Only DAEMON_COMMANDS are accepted: anything
+    # else could write the ledger or wait on input() while holding the daemon's lock.
+    args = build_parser().parse_args(argv)
+    if args.command not in DAEMON_COMMANDS:
+        print(f"Error: the daemon only runs {', '.join(sorted(DAEMON_COMMANDS))}; run `{args.command}` without it", file=sys.stderr)
+        sys.exit(2)
+    if args.timings_out or args.profile_out:
+        # Relative paths would land in the daemon's working directory, not the caller's
+        print("Error: --timings-out and --profile-out only work without the daemon (add --direct)", file=sys.stderr)
+        sys.exit(2)
+    execute(args)
+
+def main():
+    argv = sys.argv[1:]
+    args = build_parser().parse_args(argv)
+    # Timings and profiles measure this process and write files relative to its cwd, so they never go to the daemon
+    measured = args.timings or args.timings_out or args.profile or args.profile_out
+    if args.command in DAEMON_COMMANDS and not args.direct and not measured and SOCKET_PATH.exists():
+        from daemon import forward
+        status = forward(argv, sys.stdout, sys.stderr)
+        if status is not None:
+            sys.exit(status)
+    execute(args)
 
 if __name__ == "__main__":
     main()
@@ -1,153 +1,226 @@
-import plaid
-from plaid.api import plaid_api
-import os
-import plaid.model
-import plaid.model.transaction
-from plaid.model.transactions_sync_request import TransactionsSyncRequest
-from dotenv import load_dotenv
-load_dotenv()
 from datetime import date, timedelta, datetime
 from mytypes import MyTransaction, CardType
-import json
-from dataclasses import asdict
+import threading
+from itertools import islice
 from pathlib import Path
 
-import tinydb
-from tinydb import TinyDB, Query
+from store import TransactionStore, not_tagged
+from reconcile import DEFAULT_WINDOW_DAYS, DEFAULT_EXCLUDED_KINDS
+from query import Query
+from timings import timed
 
 
 # DB_PATH = "/Desktop/workspace/plaid_app/db/transactions_db.json"
 # LAST_SYNCS_PATH = "/Desktop/workspace/plaid_app/db/last_syncs.json"
 base = Path(__file__).parent  # directory where your script lives
-DB_PATH = base / "db" / "transactions_db.json"
+DB_PATH = base / "db" / "transactions.sqlite3"
+LEGACY_DB_PATH = base / "db" / "transactions_db.json"
 LAST_SYNCS_PATH = base / "db" / "last_syncs.json"
+SNAPSHOT_PATH = base / "db" / "transactions.snap"
+SOCKET_PATH = base / "db" / "tracker.sock"
 
 
-def get_access_token(card_type: CardType) -> str:
-    print(f"Getting access token for {card_type.name}")
-    return os.getenv(f"PLAID_{card_type.name}_ACCESS_TOKEN")
+class ResidentStore(TransactionStore):
+    # Held open for the life of `tracker.py serve`; per-command close() calls leave it open
+    def close(self):
+        pass
 
-def get_cursor(card_type: CardType) -> str | None:
-    with open(LAST_SYNCS_PATH, "r") as f:
-        data = json.load(f)
-        return data.get(card_type.name.lower())
+    def shutdown(self):
+        super().close()
 
-def update_cursor(card_type: CardType, new_cursor: str | None):
-    with open(LAST_SYNCS_PATH, "r") as f:
-        data = json.load(f)
-    data[card_type.name.lower()] = new_cursor
-    with open(LAST_SYNCS_PATH, "w") as f:
-        json.dump(data, f, indent=2)
+_resident_store = None
 
-def convert_to_mytransaction(plaid_transaction: plaid.model.transaction.Transaction, card: CardType) -> MyTransaction:
-    date_time = None
-    if plaid_transaction["datetime"] is not None:
-        date_time = plaid_transaction["datetime"]
-    else:
-        d = plaid_transaction["date"]
-        date_time = datetime.combine(d, datetime.min.time())
-
-    date_time = date_time.timestamp()
-
-    my_transaction = MyTransaction(
-        datetime=date_time,
-        amount=plaid_transaction["amount"],
-        name=plaid_transaction["name"],
-        merchant_name=plaid_transaction["merchant_name"],
-        plaid_category=plaid_transaction["personal_finance_category"]["primary"],
-        plaid_subcategory=plaid_transaction["personal_finance_category"]["detailed"],
-        account=card.name,
-        transaction_id=plaid_transaction["transaction_id"],
-        is_categorized=False,
-        my_category=None
-    )
-
-    return my_transaction
-
-
-def get_transactions_list_from_plaid(card: CardType, get_all = False) -> list[MyTransaction]:
-    access_token = get_access_token(card)
-    if access_token is None:
-        raise ValueError(f"Access token for {card} is not set in environment variables.")
-    
-    if get_all:
-        request = TransactionsSyncRequest(
-            access_token=access_token,
-            count=500
-        )
-    else:
-        request = TransactionsSyncRequest(
-            access_token=access_token,
-            count=500,
-            cursor=get_cursor(card)
-        )
-
-    client = plaid_api.PlaidApi(plaid.ApiClient(plaid.Configuration(
-        host=plaid.Environment.Production,
-        api_key={
-            'clientId': os.getenv("PLAID_CLIENT_ID"),
-            'secret': os.getenv("PLAID_SECRET")
-        }
-    )))
-    response = client.transactions_sync(request)
-    transactions = response['added']
-    new_cursor = response['next_cursor']
-    update_cursor(card, new_cursor)
-    
-    my_transactions = [convert_to_mytransaction(tr, card) for tr in transactions]
-
-    if response["has_more"]:
-        my_transactions.extend(get_transactions_list_from_plaid(card, get_all=False))
-
-    return my_transactions
-
-
-def update_db_single(db, one_transaction: MyTransaction, replace_if_exists = False) -> bool:
-    Transaction = Query()
-
-    existing = db.search(Transaction.transaction_id == one_transaction.transaction_id)
-    if len(existing) == 0:
-        db.insert(asdict(one_transaction))
-        return True
-    else:
-        if replace_if_exists:
-            db.update(asdict(one_transaction), Transaction.transaction_id == one_transaction.transaction_id)
-            return True
-        return False
+def keep_store_resident() -> ResidentStore:
+    global _resident_store
+    if _resident_store is None:
+        _resident_store = ResidentStore(DB_PATH)
+        prepare_store(_resident_store)
+    return _resident_store
+
+
+def open_store() -> TransactionStore:
+    if _resident_store is not None:
+        return _resident_store
+    store = TransactionStore(DB_PATH)
+    prepare_store(store)
+    return store
 
+def prepare_store(store: TransactionStore):
+    migrated = store.migrate_from_tinydb(LEGACY_DB_PATH)
+    if migrated:
+        print(f"Migrated {migrated} transactions from {LEGACY_DB_PATH.name} into {DB_PATH.name}.")
+    store.migrate_last_syncs(LAST_SYNCS_PATH)
+    store.build_category_history()
+    store.build_rollups()
+    store.build_search_index()
+    store.build_duplicates()
+
+
+@timed("update_db_from_list")
 def update_db_from_list(new_transactions: list[MyTransaction], replace_if_exists = False):
-    db = TinyDB(DB_PATH)
-    count = 0
-    skipped = 0
-    for tr in new_transactions:
-        if update_db_single(db, tr, replace_if_exists=replace_if_exists):
-            count += 1
-        else:
-            skipped += 1
+    db = open_store()
+    count, skipped = db.upsert_many(new_transactions, replace_if_exists=replace_if_exists)
     db.close()
     return count, skipped
 
-def update_db_from_plaid(card: CardType, get_all = False, replace_if_exists = False):
-    new_transactions = get_transactions_list_from_plaid(card, get_all)
-    count, skipped = update_db_from_list(new_transactions, replace_if_exists=replace_if_exists)
-    print(f"Inserted {count} new transactions from {card.name} into DB.")
-    print(f"Skipped {skipped} existing transactions for {card.name}.")
+class CategoryWriteBuffer:
+    # Collects categorize answers and writes them to the store in batches
+    def __init__(self, db: TransactionStore, flush_every = 20, flush_seconds = 30.0):
+        self.db = db
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.pending = {}
+        self.written = 0
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, transaction_id: str, category: str | None):
+        with self.lock:
+            self.pending[transaction_id] = category
+            full = len(self.pending) >= self.flush_every
+        if full:
+            self.flush()
+        elif self.timer is None and self.flush_seconds > 0:
+            self.timer = threading.Timer(self.flush_seconds, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pending:
+                return
+            batch = list(self.pending.items())
+            self.db.set_categories(batch)
+            self.pending.clear()
+            self.written += len(batch)
+
+    def close(self):
+        self.flush()
 
 
 
 # Analytics stuff
 
-def get_transactions_between_dates(start_date: date, end_date: date, card: CardType, get_only_uncategorized: bool = False) -> list[MyTransaction]:
-    db = TinyDB(DB_PATH)
-    Transaction = Query()
+def get_timestamps_between_dates(start_date: date, end_date: date) -> tuple[float, float]:
     start_timestamp = datetime.combine(start_date, datetime.min.time()).timestamp()
     end_timestamp = datetime.combine(end_date + timedelta(days=1), datetime.min.time()).timestamp() - 1
-    
-
-    if get_only_uncategorized:
-        results = db.search((Transaction.datetime >= start_timestamp) & (Transaction.datetime <= end_timestamp) & (Transaction.account == card.name) & (Transaction.my_category == None))
+    return start_timestamp, end_timestamp
+
+def bucket_starts(start_date: date, end_date: date, group_by: str) -> list[date]:
+    # First day of every day/week/month bucket touching the range; the first is clipped to start_date
+    starts = [start_date]
+    if group_by == "day":
+        step = lambda d: d + timedelta(days=1)
+    elif group_by == "week":
+        step = lambda d: d - timedelta(days=d.weekday()) + timedelta(days=7)
+    elif group_by == "month":
+        step = lambda d: date(d.year + d.month // 12, d.month % 12 + 1, 1)
     else:
-        results = db.search((Transaction.datetime >= start_timestamp) & (Transaction.datetime <= end_timestamp) & (Transaction.account == card.name))
+        raise ValueError(f"Unknown grouping: {group_by}")
+    while (nxt := step(starts[-1])) <= end_date:
+        starts.append(nxt)
+    return starts
+
+def previous_bucket_starts(start_date: date, group_by: str, count: int) -> list[date]:
+    # Starts of the `count` whole buckets before the one holding start_date, oldest first
+    if group_by == "day":
+        first, back = start_date, lambda d: d - timedelta(days=1)
+    elif group_by == "week":
+        first, back = start_date - timedelta(days=start_date.weekday()), lambda d: d - timedelta(days=7)
+    elif group_by == "month":
+        first, back = start_date.replace(day=1), lambda d: date(d.year - (d.month == 1), (d.month - 2) % 12 + 1, 1)
+    else:
+        raise ValueError(f"Unknown grouping: {group_by}")
+    starts = []
+    for _ in range(count):
+        first = back(first)
+        starts.append(first)
+    return starts[::-1]
+
+def query_between_dates(start_date: date, end_date: date, cards: list[CardType]) -> Query:
+    return Query().for_accounts([card.name for card in cards]).between(*get_timestamps_between_dates(start_date, end_date))
+
+@timed("query_transactions")
+def query_transactions(query: Query, newest_first: bool | None = None, offset: int = 0, limit: int | None = None) -> list[MyTransaction]:
+    db = open_store()
+    stop = None if limit is None else offset + limit
+    results = list(islice(db.select(query, newest_first, stop), offset, stop))
+    db.close()
+    return results
+
+def iter_transactions(query: Query, newest_first: bool | None = None, offset: int = 0, limit: int | None = None):
+    # Streams rows while the store stays open; nothing is held beyond one batch per account
+    db = open_store()
+    stop = None if limit is None else offset + limit
+    rows = db.select(query, newest_first, stop)
+    try:
+        yield from islice(rows, offset, stop)
+    finally:
+        rows.close()
+        db.close()
+
+@timed("search_transactions")
+def search_transactions(words: list[str], query: Query, prefix: bool = True, limit: int | None = None) -> list[MyTransaction]:
+    db = open_store()
+    results = db.search(words, query, prefix=prefix, limit=limit)
     db.close()
-    return [MyTransaction(**res) for res in results]
+    return results
 
+def count_transactions(query: Query) -> int:
+    db = open_store()
+    count = db.count(query)
+    db.close()
+    return count
+
+@timed("get_summary_between_dates")
+def get_summary_between_dates(start_date: date, end_date: date, cards: list[CardType], exclude_kinds = ()) -> tuple[dict[str | None, float], int]:
+    db = open_store()
+    totals, count = db.summary([card.name for card in cards], start_date.isoformat(), end_date.isoformat(), exclude_kinds)
+    db.close()
+    return totals, count
+
+@timed("get_frame")
+def get_frame(query: Query):
+    from frame import TransactionFrame
+
+    db = open_store()
+    frame = TransactionFrame.from_store(db, query)
+    db.close()
+    return frame
+
+def get_frame_between_dates(start_date: date, end_date: date, cards: list[CardType], exclude_kinds = ()):
+    query = query_between_dates(start_date, end_date, cards)
+    if exclude_kinds:
+        query.where(*not_tagged([card.name for card in cards], exclude_kinds))
+    return get_frame(query)
+
+@timed("reconcile_duplicates")
+def reconcile_duplicates(rebuild: bool = False, window_days: float = DEFAULT_WINDOW_DAYS) -> dict[str, int]:
+    db = open_store()
+    if rebuild:
+        db.requeue_duplicates()
+    tagged = db.reconcile_duplicates(window_days)
+    db.close()
+    return tagged
+
+def get_duplicate_pairs(query: Query) -> list:
+    db = open_store()
+    pairs = db.duplicate_pairs(query)
+    db.close()
+    return pairs
+
+@timed("load_snapshot")
+def load_snapshot():
+    # mmap the binary snapshot, rebuilding it first if the ledger changed since it was written
+    from snapshot import open_fresh_snapshot, write_snapshot, Snapshot
+
+    db = open_store()
+    snap = open_fresh_snapshot(SNAPSHOT_PATH, db.ledger_version())
+    if snap is None:
+        write_snapshot(db, SNAPSHOT_PATH)
+        snap = Snapshot(SNAPSHOT_PATH)
+    db.close()
+    return snap